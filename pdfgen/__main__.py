@@ -3,10 +3,14 @@
 
 # Python Standard Library Imports
 import argparse
+import json
 import logging
 
 # Locals Imports
-from pdfgen import engine
+from pdfgen import batch
+from pdfgen import overlays
+from pdfgen import sheets
+from pdfgen import stats as render_stats
 
 
 def parse_arguments(args=None):
@@ -17,14 +21,73 @@ def parse_arguments(args=None):
                                  help='path to the layout file (.json)')
     argument_parser.add_argument('-f', '--font-folder', metavar='folder', type=str,
                                  help='path to the font folder')
+    argument_parser.add_argument('--font-cache', metavar='folder', type=str,
+                                 help='folder to keep parsed fonts in for a faster start')
+    argument_parser.add_argument('--overlay-cache', metavar='folder', type=str,
+                                 help='folder to keep rendered records in, so reprinting '
+                                      'a record skips drawing it')
+    argument_parser.add_argument('--overlay-cache-size', metavar='MB', type=float,
+                                 default=overlays.OverlayCache.DEFAULT_SIZE / 2.0 ** 20,
+                                 help='size the overlay cache is trimmed to, in megabytes')
     argument_parser.add_argument('-i', '--image-folder', metavar='folder', type=str,
                                  help='path to the image folder')
     argument_parser.add_argument('-e', '--entries', nargs='*', metavar='text', type=str,
                                  help='inputs to be printed')
     argument_parser.add_argument('-k', '--keys', nargs='*', metavar='key', type=str,
-                                 help='key of the inputs to be printed')
+                                 help='key of the inputs to be printed; in batch mode, '
+                                      'key=column reads a key from another column')
+    argument_parser.add_argument('-b', '--batch', metavar='file', type=str,
+                                 help='path to a CSV or JSONL file with one record per row, '
+                                      'or - to read from stdin')
+    argument_parser.add_argument('--batch-format', choices=batch.valid_formats(),
+                                 help='format of the batch file, detected from its '
+                                      'extension by default')
+    argument_parser.add_argument('-c', '--config', metavar='file', type=str,
+                                 help='path to a job config (.json) listing groups and the keys on '
+                                      'each side; in batch mode, prints each record with the '
+                                      'template and layout of its group')
+    argument_parser.add_argument('--group-key', metavar='column', type=str,
+                                 help='column holding the group of each record, '
+                                      'group by default')
     argument_parser.add_argument('-o', '--output-file', metavar='file', type=str,
                                  help='path to the output file (.pdf)')
+    argument_parser.add_argument('-O', '--output-template', metavar='pattern', type=str,
+                                 help='write one file per batch record, named from a pattern '
+                                      'such as out/{index}-{name}.pdf')
+    argument_parser.add_argument('--incremental', action='store_true',
+                                 help='in batch mode, only draw records that changed since the '
+                                      'output file was last written and append them to it')
+    argument_parser.add_argument('--record-key', metavar='column', type=str,
+                                 help='column identifying each record in the incremental '
+                                      'manifest, the row number by default')
+    argument_parser.add_argument('-j', '--workers', metavar='count', type=int,
+                                 help='number of worker processes to render with, '
+                                      '0 for one per CPU core')
+    argument_parser.add_argument('--shared-template', action='store_true',
+                                 help='write each template page once and reference it '
+                                      'from every output page')
+    argument_parser.add_argument('--sheet', metavar='size', type=str,
+                                 help='impose badges on print sheets of a size: {names} '
+                                      'or WIDTHxHEIGHT in cm'.format(
+                                          names=', '.join(sheets.SHEET_SIZES)))
+    argument_parser.add_argument('--grid', metavar='COLUMNSxROWS', type=str,
+                                 help='badges per sheet, as many as fit by default')
+    argument_parser.add_argument('--gutter', metavar='cm', type=float, default=0.0,
+                                 help='space between badges on a sheet')
+    argument_parser.add_argument('--margin', metavar='cm', type=float,
+                                 default=sheets.SheetLayout.DEFAULT_MARGIN,
+                                 help='space kept clear around the edges of a sheet')
+    argument_parser.add_argument('--no-crop-marks', action='store_true',
+                                 help='leave crop marks off the sheets')
+    argument_parser.add_argument('--duplex', action='store_true',
+                                 help='pair pages as front and back, with backs on mirrored sheets')
+    argument_parser.add_argument('--serve', metavar='address', type=str,
+                                 help='run a render server on host:port or unix:/path/to/socket '
+                                      'that keeps generators warm between requests')
+    argument_parser.add_argument('--stats', action='store_true',
+                                 help='log how long each rendering stage took')
+    argument_parser.add_argument('--stats-json', metavar='file', type=str,
+                                 help='write the rendering stats to a JSON file')
     argument_parser.add_argument('-v', '--verbose', action='store_true',
                                  help='increase output verbosity')
     return argument_parser.parse_args(args)
@@ -50,13 +113,114 @@ def main():
     entries = args.entries
     keys = args.keys
     output_file = args.output_file
+    stats = render_stats.RenderStats() if args.stats or args.stats_json else None
 
-    if len(args.entries) == len(args.keys):
-        pdf_generator = engine.PdfGenerator(template_path, layout_path, font_root_path, image_root_path)
-        pdf_generator.generate([entries], [keys], output_file)
-        logger.info('Generated at {output}'.format(output=output_file))
+    if args.sheet:
+        try:
+            columns, rows = sheets.parse_grid(args.grid) if args.grid else (None, None)
+            imposition = sheets.SheetLayout(args.sheet, columns=columns, rows=rows,
+                                            gutter=args.gutter, margin=args.margin,
+                                            crop_marks=not args.no_crop_marks,
+                                            duplex=args.duplex)
+        except ValueError as error:
+            logger.error(str(error))
+            return
     else:
-        logger.error('Entries and keys should have the same number of elements.')
+        imposition = None
+
+    # The engine pulls in reportlab and PyPDF2, and the modes below it, so
+    # they are only imported once the arguments are known to be good,
+    # keeping --help and usage errors quick. Each mode imports what it uses.
+    from pdfgen import engine
+
+    if args.workers == 0:
+        from pdfgen import parallel
+        workers = parallel.default_workers()
+    else:
+        workers = args.workers
+    overlay_options = {
+        'overlay_cache_path': args.overlay_cache,
+        'overlay_cache_size': int(args.overlay_cache_size * 2 ** 20),
+    }
+
+    # Bad keys, output templates naming missing columns and the like only
+    # show up once records are read, and are reported like bad arguments.
+    try:
+        if args.serve:
+            from pdfgen import server
+            service = server.RenderService(template_path, layout_path, font_root_path, image_root_path,
+                                           font_cache_path=args.font_cache, stats=stats,
+                                           **overlay_options)
+            server.serve(args.serve, service)
+        elif args.batch and args.config:
+            from pdfgen import job
+            if output_file is None:
+                logger.error('Config mode needs an output file.')
+                return
+            if template_path or layout_path or keys or args.workers is not None:
+                logger.error('Config mode takes each group\'s template and layout from the config '
+                             'folder and the keys from the config, and does not take -t, -l, -k '
+                             'or -j.')
+                return
+            print_job = job.Job(args.config, font_root_path, image_root_path,
+                                group_key=args.group_key or job.Job.DEFAULT_GROUP_KEY, stats=stats,
+                                font_cache_path=args.font_cache, **overlay_options)
+            records = batch.read_records(args.batch, args.batch_format)
+            count = print_job.generate(records, output_file,
+                                       shared_template=args.shared_template,
+                                       imposition=imposition)
+            logger.info('Generated {count} records at {output}'.format(count=count, output=output_file))
+        elif args.batch and args.incremental:
+            from pdfgen import rebuild
+            if output_file is None or imposition is not None:
+                logger.error('Incremental mode needs an output file and no imposition.')
+                return
+            pdf_generator = engine.PdfGenerator(template_path, layout_path, font_root_path, image_root_path,
+                                                font_cache_path=args.font_cache, stats=stats,
+                                                **overlay_options)
+            rebuilder = rebuild.BatchRebuilder(pdf_generator, output_file, keys=keys,
+                                               record_key=args.record_key,
+                                               shared_template=args.shared_template)
+            result = rebuilder.rebuild(batch.read_records(args.batch, args.batch_format))
+            logger.info('{action} {output} with {records} records: {rendered} drawn, {kept} kept, '
+                        '{removed} removed'.format(action='Updated' if result.updated else 'Generated',
+                                                   output=output_file, **result._asdict()))
+        elif args.batch:
+            if output_file is None and args.output_template is None:
+                logger.error('Batch mode needs either an output file or an output template.')
+                return
+            pdf_generator = engine.PdfGenerator(template_path, layout_path, font_root_path, image_root_path,
+                                                font_cache_path=args.font_cache, stats=stats,
+                                                **overlay_options)
+            records = batch.read_records(args.batch, args.batch_format)
+            count = batch.generate_batch(pdf_generator, records, keys=keys,
+                                         output_file=output_file,
+                                         filename_template=args.output_template,
+                                         workers=workers,
+                                         shared_template=args.shared_template,
+                                         imposition=imposition)
+            logger.info('Generated {count} records at {output}'.format(
+                count=count, output=args.output_template or output_file))
+        elif entries is not None and keys is not None and len(entries) == len(keys):
+            pdf_generator = engine.PdfGenerator(template_path, layout_path, font_root_path, image_root_path,
+                                                font_cache_path=args.font_cache, stats=stats,
+                                                **overlay_options)
+            pdf_generator.generate([entries], [keys], output_file,
+                                   shared_template=args.shared_template,
+                                   imposition=imposition)
+            logger.info('Generated at {output}'.format(output=output_file))
+        else:
+            logger.error('Entries and keys should have the same number of elements.')
+            return
+    except ValueError as error:
+        logger.error(str(error))
+        return
+
+    if args.stats:
+        logger.info('Rendering stats:\n{summary}'.format(summary=stats.summary()))
+    if args.stats_json:
+        with open(args.stats_json, 'wt') as stats_file:
+            json.dump(stats.as_dict(), stats_file, indent=2)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+# Python Standard Library Imports
+import asyncio
+import concurrent.futures
+import io
+import threading
+
+# Local Imports
+from pdfgen import engine
+from pdfgen import writer
+
+
+class AsyncPdfGenerator(object):
+    DEFAULT_CONCURRENCY = 64
+    DEFAULT_EXECUTOR_WORKERS = 4
+
+    def __init__(self, template_path=None, layout_path=None,
+                 font_root_path=None, image_root_path=None,
+                 pdf_generator=None, max_concurrency=DEFAULT_CONCURRENCY,
+                 executor=None, executor_workers=DEFAULT_EXECUTOR_WORKERS):
+        if pdf_generator is None:
+            pdf_generator = engine.PdfGenerator(template_path=template_path,
+                                                layout_path=layout_path,
+                                                font_root_path=font_root_path,
+                                                image_root_path=image_root_path)
+        self.pdf_generator = pdf_generator
+        self.max_concurrency = max_concurrency
+
+        self._own_executor = executor is None
+        if executor is None:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=executor_workers)
+        self._executor = executor
+        self._semaphore = None
+        # Drawing runs concurrently on the executor, but the template reader
+        # is shared, so composing and writing documents is serialized.
+        self._write_lock = threading.Lock()
+
+    @property
+    def semaphore(self):
+        # Created lazily so it binds to the loop that first uses it.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def arender(self, entries, order, shared_template=False):
+        # Requests beyond the concurrency limit wait here, so callers are
+        # slowed down instead of queueing unbounded work on the executor.
+        async with self.semaphore:
+            rendered_pages = await self._run(self._render_pages, entries, order)
+            return await self._run(self._write_document, rendered_pages, shared_template)
+
+    async def agenerate(self, entries, order, filename, shared_template=False):
+        pdf_bytes = await self.arender(entries, order, shared_template=shared_template)
+        await self._run(_write_file, filename, pdf_bytes)
+        return len(pdf_bytes)
+
+    def close(self):
+        if self._own_executor:
+            self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _run(self, function, *args):
+        # Only called from the coroutines above, so there is always a running loop.
+        return asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def _render_pages(self, entries, order):
+        # Template, layout and assets are all read here, off the event loop.
+        return [self.pdf_generator._render_page(entries=page_entries, order=page_order)
+                for page_entries, page_order in zip(entries, order)]
+
+    def _write_document(self, rendered_pages, shared_template):
+        output_stream = io.BytesIO()
+        with self._write_lock:
+            pdf_output = writer.PdfStreamWriter(output_stream)
+            for __ in self.pdf_generator._write_pages(pdf_output, rendered_pages, shared_template):
+                pass
+            self.pdf_generator._close_output(pdf_output)
+        return output_stream.getvalue()
+
+
+def _write_file(filename, data):
+    with open(filename, 'wb') as file_output_stream:
+        file_output_stream.write(data)
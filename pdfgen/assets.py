@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+# Python Standard Library Imports
+import collections
+import io
+import os
+
+# Third Party Library Imports
+import PyPDF2
+from reportlab.lib.utils import ImageReader
+
+# Local Imports
+from pdfgen import lru
+
+# PIL and svglib (with lxml) are imported by the loaders that need them, so
+# layouts without images never pay for them.
+
+Asset = collections.namedtuple('Asset', ['source', 'width', 'height'])
+
+
+def load_raster(path):
+    from PIL import Image
+    image = ImageReader(Image.open(path))
+    # Decode once up front so every later draw reuses the pixel data.
+    image.getRGBData()
+    width, height = image.getSize()
+    return Asset(source=image, width=width, height=height)
+
+
+def load_svg(path):
+    from svglib.svglib import svg2rlg
+    drawing = svg2rlg(path)
+    return Asset(source=drawing, width=drawing.minWidth(), height=drawing.height)
+
+
+def load_pdf(path):
+    with open(path, 'rb') as pdf_file:
+        reader = PyPDF2.PdfFileReader(io.BytesIO(pdf_file.read()))
+    page = reader.getPage(0)
+    return Asset(source=page,
+                 width=float(page.mediaBox[2]),
+                 height=float(page.mediaBox[3]))
+
+
+class AssetCache(lru.LruCache):
+    DEFAULT_SIZE = 32
+
+    def raster(self, path):
+        return self._load(load_raster, path)
+
+    def svg(self, path):
+        return self._load(load_svg, path)
+
+    def pdf(self, path):
+        return self._load(load_pdf, path)
+
+    def _load(self, loader, path):
+        # Keying on the modification time picks up assets replaced on disk.
+        key = (loader, os.path.abspath(path), os.path.getmtime(path))
+        return self._get(key, loader, path)
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+# Python Standard Library Imports
+import csv
+import itertools
+import json
+import os
+import string
+import sys
+
+FORMAT_CSV = 'csv'
+FORMAT_JSONL = 'jsonl'
+STDIN_PATH = '-'
+
+_FORMAT_EXTENSIONS = {
+    '.csv': FORMAT_CSV,
+    '.jsonl': FORMAT_JSONL,
+    '.ndjson': FORMAT_JSONL,
+}
+
+
+def valid_formats():
+    return [FORMAT_CSV, FORMAT_JSONL]
+
+
+def detect_format(path):
+    __, extension = os.path.splitext(path)
+    return _FORMAT_EXTENSIONS.get(extension.lower(), FORMAT_CSV)
+
+
+def read_records(path, record_format=None):
+    if record_format is None:
+        record_format = FORMAT_CSV if path == STDIN_PATH else detect_format(path)
+    if record_format not in valid_formats():
+        raise ValueError('Unknown record format: {format}'.format(format=record_format))
+
+    if path == STDIN_PATH:
+        for record in _iter_records(sys.stdin, record_format):
+            yield record
+    else:
+        with open(path, 'rt', encoding='utf-8-sig', newline='') as record_file:
+            for record in _iter_records(record_file, record_format):
+                yield record
+
+
+def _iter_records(stream, record_format):
+    if record_format == FORMAT_CSV:
+        for row in csv.DictReader(stream):
+            yield row
+    else:
+        for line_number, line in enumerate(stream, start=1):
+            if line.strip():
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError('Line {line} is not a JSON object'.format(line=line_number))
+                yield record
+
+
+def parse_key_mapping(keys, layout):
+    # Each key is either a layout key, read from the column of the same name,
+    # or `key=column` to read a layout key from a differently named column.
+    if not keys:
+        return None
+    mapping = []
+    for key in keys:
+        layout_key, __, column = key.partition('=')
+        if layout_key not in layout:
+            raise ValueError('Key {key} does not exist in the layout'.format(key=layout_key))
+        mapping.append((layout_key, column or layout_key))
+    return mapping
+
+
+def record_page(record, layout, mapping=None):
+    if mapping is None:
+        mapping = [(column, column) for column in record if column in layout]
+    entries = []
+    order = []
+    for layout_key, column in mapping:
+        value = record.get(column)
+        entries.append('' if value is None else str(value))
+        order.append(layout_key)
+    return entries, order
+
+
+def format_filename(filename_template, record, index):
+    safe_record = {column: _safe_path_component(value)
+                   for column, value in record.items()
+                   if isinstance(column, str)}
+    safe_record['index'] = index
+    try:
+        return string.Formatter().vformat(filename_template, (), safe_record)
+    except KeyError as error:
+        raise ValueError('Output template refers to {column}, which record {index} does not have'
+                         .format(column=error, index=index))
+    except IndexError:
+        raise ValueError('Output template should only name columns and {index}')
+
+
+def _safe_path_component(value):
+    # Values become part of a path, so they can neither add folders nor,
+    # as . or .., point outside the folder the pattern names.
+    text = '' if value is None else str(value).strip()
+    for separator in (os.sep, os.altsep):
+        if separator:
+            text = text.replace(separator, '_')
+    if text in (os.curdir, os.pardir):
+        text = text.replace('.', '_')
+    return text
+
+
+def generate_batch(pdf_generator, records, keys=None,
+                   output_file=None, filename_template=None, workers=None,
+                   **generate_options):
+    layout = pdf_generator.layout
+    mapping = parse_key_mapping(keys, layout)
+
+    if filename_template is not None:
+        def jobs():
+            for index, record in enumerate(records, start=1):
+                entries, order = record_page(record, layout, mapping)
+                filename = format_filename(filename_template, record, index)
+                directory = os.path.dirname(filename)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                yield entries, order, filename
+
+        if workers is not None and workers > 1:
+            # Only imported here, so reading records does not load multiprocessing.
+            from pdfgen import parallel
+            return parallel.generate_files(type(pdf_generator), pdf_generator._worker_args(),
+                                           jobs(), workers,
+                                           generate_options=generate_options)
+
+        count = 0
+        for entries, order, filename in jobs():
+            pdf_generator.generate([entries], [order], filename, **generate_options)
+            count += 1
+        return count
+
+    counter = {'count': 0}
+
+    def pages():
+        for record in records:
+            counter['count'] += 1
+            yield record_page(record, layout, mapping)
+
+    # generate() zips entries and order in lockstep, so tee only ever buffers
+    # the current row.
+    entries_pages, order_pages = itertools.tee(pages())
+    pdf_generator.generate((entries for entries, __ in entries_pages),
+                           (order for __, order in order_pages),
+                           output_file, workers=workers, **generate_options)
+    return counter['count']
@@ -2,377 +2,560 @@
 
 # Python Standard Library Imports
 import collections
+import hashlib
 import io
 import os
+import time
 
 # Third Party Library Imports
-import PIL
 import PyPDF2
-from reportlab.graphics import renderPDF
-from reportlab.graphics import shapes
-from reportlab.graphics.barcode import code39
-from reportlab.graphics.barcode import qr
-from reportlab.lib import colors
+import reportlab
 from reportlab.lib import units
-from reportlab.lib.utils import ImageReader
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase import ttfonts
 from reportlab.pdfgen import canvas
-from svglib.svglib import svg2rlg
 
 # Local Imports
+from pdfgen import assets
+from pdfgen import fonts
+from pdfgen import merge
 from pdfgen import metadata
+from pdfgen import overlays
 from pdfgen import parser
+from pdfgen import plan
+from pdfgen import stats as render_stats
+from pdfgen import symbols
+from pdfgen import template
 from pdfgen import utils
+from pdfgen import writer
 
 
-def load_fonts(font_root_path):
-    for font_filename in os.listdir(font_root_path):
-        font_path = os.path.join(font_root_path, font_filename)
-        if os.path.isfile(font_path):
-            font_name, font_ext = os.path.splitext(os.path.basename(font_path))
-            if font_ext == '.ttf':
-                font_name = font_name.replace(' ', '_')
-                font = ttfonts.TTFont(font_name, font_path)
-                pdfmetrics.registerFont(font)
+# Kept here for callers that load fonts through the engine module.
+load_fonts = fonts.load_fonts
+
+
+# Rendered pages cross process boundaries in parallel mode, so they only hold
+# the serialized canvas overlay and the name and placement of each PDF image.
+RenderedPage = collections.namedtuple('RenderedPage', ['canvas_data', 'images'])
 
 
 class PdfGenerator(object):
     DEFAULT_PAGE_WIDTH = 9.0 * units.cm
     DEFAULT_PAGE_HEIGHT = 6.2 * units.cm
     Size = collections.namedtuple('Size', ['width', 'height'])
+    Overlay = collections.namedtuple('Overlay', ['page', 'ctm', 'shared'])
 
     def __init__(self, template_path=None, layout_path=None,
-                 font_root_path=None, image_root_path=None):
-        self._template = None
-
+                 font_root_path=None, image_root_path=None,
+                 asset_cache_size=assets.AssetCache.DEFAULT_SIZE,
+                 font_cache_path=None,
+                 symbol_cache_size=symbols.SymbolCache.DEFAULT_SIZE,
+                 stats=None, overlay_cache_path=None,
+                 overlay_cache_size=overlays.OverlayCache.DEFAULT_SIZE):
+        # A RenderStats object to record timings and counts into, or None.
+        self.stats = stats
         self.template_path = template_path
         self.layout_path = layout_path
-        load_fonts(font_root_path)
+        self.font_root_path = font_root_path
+        self.font_cache_path = font_cache_path
         self.image_root_path = image_root_path
+        self.assets = assets.AssetCache(asset_cache_size)
+        self.symbols = symbols.SymbolCache(symbol_cache_size)
+        # Rendered records are only kept on disk when given a folder.
+        if overlay_cache_path is None:
+            self.overlays = None
+        else:
+            self.overlays = overlays.OverlayCache(overlay_cache_path, overlay_cache_size)
+        if stats is not None:
+            stats.watch('assets', self.assets)
+            stats.watch('symbols', self.symbols)
+            if self.overlays is not None:
+                stats.watch('overlays', self.overlays)
+
+    @property
+    def template_path(self):
+        return self._template_path
+
+    @template_path.setter
+    def template_path(self, value):
+        self._template_path = value
+        self._template = None
+        self._overlay_fingerprint = None
+        self._page_size = None
+        self._layout_plan = None
+        self._static_overlays = None
 
     @property
     def template(self):
         if self._template is None:
-            self._template = PyPDF2.PdfFileReader(open(self.template_path, 'rb'))
+            self._template = self._timed(render_stats.STAGE_TEMPLATE,
+                                         template.Template, self.template_path,
+                                         compose=self._compose_static)
         return self._template
 
+    @property
+    def static_overlays(self):
+        if self._static_overlays is None:
+            static_fields = sorted((key, field.value)
+                                   for key, field in self.layout_plan.items()
+                                   if field.value is not None)
+            rendered_page = self._render_page(entries=[value for __, value in static_fields],
+                                              order=[key for key, __ in static_fields],
+                                              static=True)
+            # Static overlays are drawn from every page, so their forms go
+            # into a store that each document writes once.
+            self._static_forms = merge.FormStore()
+            self._static_overlays = [
+                static_overlay._replace(shared=True)
+                for static_overlay in self._load_page_overlays(rendered_page)
+            ]
+        return self._static_overlays
+
     @property
     def layout_path(self):
         return self._layout_path
 
     @layout_path.setter
     def layout_path(self, value):
+        # Template pages hold the layout's static fields, so they go too.
+        self._template = None
+        self._layout_plan = None
+        self._static_overlays = None
+        self._overlay_fingerprint = None
         if value is None:
             self._layout_path = None
             self.layout = None
         else:
             self._layout_path = value
-            self.layout = parser.parse_layout(value)
+            self.layout = self._timed(render_stats.STAGE_LAYOUT, parser.parse_layout, value)
+
+    @property
+    def layout_plan(self):
+        if self._layout_plan is None:
+            # Only the fonts the layout draws with are parsed and registered.
+            if self.font_root_path is not None:
+                self._timed(render_stats.STAGE_FONTS,
+                            fonts.load_layout_fonts, self.font_root_path, self.layout,
+                            self.font_cache_path)
+            draw_routines = {
+                metadata.DrawFormat.CATEGORY_TEXT: self._draw_text,
+                metadata.DrawFormat.CATEGORY_QR: self._draw_qr,
+                metadata.DrawFormat.CATEGORY_BAR: self._draw_bar,
+                metadata.DrawFormat.CATEGORY_IMAGE: self._draw_image,
+            }
+            self._layout_plan = plan.compile_layout(self.layout,
+                                                    self.page_size.width,
+                                                    draw_routines)
+        return self._layout_plan
+
+    @property
+    def overlay_fingerprint(self):
+        # Everything a record's overlay depends on besides its own values:
+        # the layout, the template's page size, the fonts the layout draws
+        # with and the reportlab version writing the canvas. Editing any of
+        # them moves every record to a new cache key.
+        if self._overlay_fingerprint is None:
+            parts = [reportlab.Version]
+            if self.layout_path is not None:
+                with open(self.layout_path, 'rb') as layout_file:
+                    parts.append(hashlib.sha256(layout_file.read()).hexdigest())
+            if self.template_path is not None:
+                parts.append(overlays.file_fingerprint(self.template_path))
+            if self.font_root_path is not None and self.layout is not None:
+                font_files = fonts.font_files(self.font_root_path)
+                for font_name in sorted(fonts.layout_font_names(self.layout)):
+                    if font_name in font_files:
+                        parts.append(overlays.file_fingerprint(font_files[font_name]))
+            parts.append(self.image_root_path)
+            self._overlay_fingerprint = overlays.digest(*parts)
+        return self._overlay_fingerprint
 
     @property
     def page_size(self):
-        try:
-            media_box = self.template.getPage(0).mediaBox
-        except AttributeError:
-            width, height = (self.DEFAULT_PAGE_WIDTH, self.DEFAULT_PAGE_HEIGHT)
+        if self._page_size is None:
+            if self.template_path is None:
+                width, height = (self.DEFAULT_PAGE_WIDTH, self.DEFAULT_PAGE_HEIGHT)
+            else:
+                width, height = self.template.page_size()
+            self._page_size = type(self).Size(width=width, height=height)
+        return self._page_size
+
+    def generate(self, entries, order, filename, workers=None,
+                 shared_template=False, imposition=None):
+        # Checked before the file is opened, so bad options leave it as it was.
+        self._check_imposition(imposition)
+        with open(filename, 'wb') as file_output_stream:
+            self.generate_to(file_output_stream, entries, order,
+                             workers=workers, shared_template=shared_template,
+                             imposition=imposition)
+
+    def generate_to(self, output_stream, entries, order, workers=None,
+                    shared_template=False, imposition=None):
+        # Writes to any binary file-like object with a write() method.
+        pdf_output = self._open_output(output_stream, imposition)
+        for __ in self._compose_pages(pdf_output, entries, order, workers,
+                                      shared_template or imposition is not None):
+            pass
+        self._close_output(pdf_output)
+
+    def generate_bytes(self, entries, order, workers=None, shared_template=False,
+                       imposition=None):
+        output_stream = io.BytesIO()
+        self.generate_to(output_stream, entries, order,
+                         workers=workers, shared_template=shared_template,
+                         imposition=imposition)
+        return output_stream.getvalue()
+
+    def generate_chunks(self, entries, order, workers=None, shared_template=False,
+                        imposition=None):
+        # Yields the document as it is written, one chunk per page, so it can
+        # be sent on before the remaining pages are rendered.
+        output_stream = io.BytesIO()
+        pdf_output = self._open_output(output_stream, imposition)
+        for __ in self._compose_pages(pdf_output, entries, order, workers,
+                                      shared_template or imposition is not None):
+            yield _drain(output_stream)
+        self._close_output(pdf_output)
+        yield _drain(output_stream)
+
+    def _open_output(self, output_stream, imposition):
+        pdf_output = writer.PdfStreamWriter(output_stream)
+        if imposition is None:
+            return pdf_output
+        # Imposed badges are placed as forms, so each page only draws the
+        # shared template form rather than a copy of the template content.
+        # Only imported here, so plain renders do not load the imposition code.
+        from pdfgen import impose
+        return impose.ImposedWriter(pdf_output, imposition,
+                                    self.page_size.width, self.page_size.height)
+
+    def _check_imposition(self, imposition):
+        # Raises the ValueError ImposedWriter would if the badges do not fit.
+        if imposition is not None:
+            imposition.grid(self.page_size.width, self.page_size.height)
+
+    def _timed(self, stage, function, *args, **kwargs):
+        if self.stats is None:
+            return function(*args, **kwargs)
+        return self.stats.timed(stage, function, *args, **kwargs)
+
+    def _close_output(self, pdf_output):
+        close_output(pdf_output, self.stats)
+
+    def _compose_pages(self, pdf_output, entries, order, workers, shared_template):
+        pages = zip(entries, order)
+        if workers is not None and workers > 1:
+            # Only imported here, so single process renders do not load multiprocessing.
+            from pdfgen import parallel
+            rendered_pages = parallel.render_pages(type(self), self._worker_args(),
+                                                   pages, workers)
         else:
-            width, height = (float(media_box[2]), float(media_box[3]))
-        finally:
-            size = type(self).Size(width=width, height=height)
-        return size
-
-    def generate(self, entries, order, filename):
-        pdf_output = PyPDF2.PdfFileWriter()
-
-        for i, (page_entries, page_order) in enumerate(zip(entries, order)):
-            generated_overlays = self._draw_page_overlays(entries=page_entries,
-                                                          order=page_order)
-            try:
-                page_output = self.template.getPage(i)
-            except IndexError:
-                page_output = self.template.getPage(0)
+            rendered_pages = (self._render_page(entries=page_entries,
+                                                order=page_order)
+                              for page_entries, page_order in pages)
+        return self._write_pages(pdf_output, rendered_pages, shared_template)
+
+    def _worker_args(self):
+        # Arguments for a generator like this one in a worker process.
+        return (self.template_path, self.layout_path,
+                self.font_root_path, self.image_root_path,
+                self.assets.max_size, self.font_cache_path,
+                self.symbols.max_size, None,
+                None if self.overlays is None else self.overlays.cache_path,
+                overlays.OverlayCache.DEFAULT_SIZE if self.overlays is None
+                else self.overlays.max_size)
+
+    def _write_pages(self, pdf_output, rendered_pages, shared_template=False):
+        write_page = self._page_writer(pdf_output, shared_template)
+        for i, rendered_page in enumerate(rendered_pages):
+            yield write_page(rendered_page, i)
+
+    def _page_writer(self, pdf_output, shared_template=False):
+        # Shares what the generator draws on every page of a document with
+        # the output, and returns a function writing one rendered page onto
+        # the template page at an index.
+        pdf_output.share(self.template.reader)
+        for static_overlay in self.static_overlays:
+            pdf_output.share(static_overlay.page.pdf)
+        pdf_output.share(self._static_forms)
+        pdf_output.share(merge.CONSTANTS)
+        template_forms = {}
+        overlay_forms = {}
+
+        def write_page(rendered_page, index):
+            generated_overlays = self._timed(render_stats.STAGE_MERGE,
+                                             self._load_page_overlays, rendered_page)
+            if shared_template:
+                template_index = self.template.page_index(index)
+                if template_index not in template_forms:
+                    template_forms[template_index] = pdf_output.add_object(
+                        self.template.form_xobject(template_index)
+                    )
+                page_output = self.template.xobject_page(template_index,
+                                                         template_forms[template_index])
+            else:
+                page_output = self.template.fresh_page(index)
 
             for generated_overlay in generated_overlays:
+                if generated_overlay.shared:
+                    # Cached assets keep their reader alive, so whatever they
+                    # embed is written once per document.
+                    pdf_output.share(generated_overlay.page.pdf)
+            self._timed(render_stats.STAGE_MERGE,
+                        self._merge_overlays, page_output, generated_overlays,
+                        overlay_forms, pdf_output.add_object)
+
+            return self._timed(render_stats.STAGE_WRITE, pdf_output.add_page, page_output)
+        return write_page
+
+    def _merge_overlays(self, page_output, overlays, shared_forms, add_form, store=None):
+        # The form of a shared overlay is added once through add_form, kept
+        # in shared_forms, and referenced from every page that draws it.
+        merged_overlays = []
+        for overlay in overlays:
+            form = None
+            if overlay.shared:
+                shared_form = shared_forms.get(id(overlay.page))
+                if shared_form is None:
+                    # The page is kept with its form so its id stays unique.
+                    shared_form = (overlay.page, add_form(merge.page_form(overlay.page)))
+                    shared_forms[id(overlay.page)] = shared_form
+                form = shared_form[1]
+            merged_overlays.append((overlay.page, form, overlay.ctm))
+        merge.merge_overlays(page_output, merged_overlays, store)
+
+    def _compose_static(self, page):
+        # Fields with a fixed value in the layout are drawn and merged into
+        # each template page once, instead of once for every record.
+        static_overlays = self.static_overlays
+        if not static_overlays:
+            return page
+        composed_page = PyPDF2.pdf.PageObject(page.pdf)
+        composed_page.update(page)
+        self._merge_overlays(composed_page, static_overlays, {},
+                             self._static_forms.add, self._static_forms)
+        return composed_page
+
+    def _render_page(self, entries, order, static=False):
+        if static or self.overlays is None:
+            return self._draw_page(entries, order, static)
+        key = self._overlay_key(entries, order)
+        if key is None:
+            return self._draw_page(entries, order)
+        cached_page = self.overlays.get(key)
+        if cached_page is not None:
+            return RenderedPage(*cached_page)
+        rendered_page = self._draw_page(entries, order)
+        # Stored as a plain tuple, so entries outlive changes to this module.
+        self.overlays.put(key, tuple(rendered_page))
+        return rendered_page
+
+    def _overlay_key(self, entries, order):
+        # Image fields also key on the files they name, so replacing an
+        # image redraws the records showing it. Records naming a missing
+        # image are drawn uncached, to fail the way they always have.
+        parts = [self.overlay_fingerprint]
+        for entry_key, entry_string in zip(order, entries):
+            if not entry_string or not entry_string.strip():
+                continue
+            stripped_entry_string = entry_string.strip()
+            parts.extend((entry_key, stripped_entry_string))
+            field = self.layout.get(entry_key)
+            if field is not None and field.category == metadata.DrawFormat.CATEGORY_IMAGE:
                 try:
-                    page_overlay = generated_overlay.getPage(0)
-                except IndexError:
-                    pass
-                else:
-                    page_output.mergePage(page_overlay)
+                    parts.append(overlays.file_fingerprint(
+                        self._image_named(stripped_entry_string)))
+                except (OSError, TypeError):
+                    return None
+        return overlays.digest(*parts)
 
-            pdf_output.addPage(page_output)
+    def _draw_page(self, entries, order, static=False):
+        images = []
 
-        with open(filename, 'wb') as file_output_stream:
-            pdf_output.write(file_output_stream)
-
-    def _draw_page_overlays(self, entries, order):
-        overlays = []
+        draw_buffer = io.BytesIO()
+        draw_canvas = canvas.Canvas(draw_buffer, pagesize=self.page_size)
+        canvas_used = False
 
+        layout_plan = self.layout_plan
+        page_stats = self.stats
         for entry_key, entry_string in zip(order, entries):
             if entry_string and entry_string.strip():
+                field = layout_plan[entry_key]
+                # Static fields are drawn once into the template instead.
+                if (field.value is not None) != static:
+                    continue
                 stripped_entry_string = entry_string.strip()
-                draw_format = self.layout[entry_key]
-                if draw_format.category == metadata.DrawFormat.CATEGORY_TEXT:
-                    overlays.append(self._draw_text(stripped_entry_string,
-                                                    draw_format))
-                elif draw_format.category == metadata.DrawFormat.CATEGORY_QR:
-                    overlays.append(self._draw_qr(stripped_entry_string,
-                                                  draw_format))
-                elif draw_format.category == metadata.DrawFormat.CATEGORY_BAR:
-                    overlays.append(self._draw_bar(stripped_entry_string,
-                                                   draw_format))
-                elif draw_format.category == metadata.DrawFormat.CATEGORY_IMAGE:
-                    overlays.append(self._draw_image(stripped_entry_string,
-                                                     draw_format))
-
-        return overlays
-
-    def _draw_text(self, content, draw_format):
-        draw_buffer = io.BytesIO();
-        draw_canvas = canvas.Canvas(draw_buffer, pagesize=self.page_size)
-
-        font_name = draw_format.font
-        font_size = draw_format.size
-        draw_canvas.setFont(font_name, font_size)
+                draw_canvas.saveState()
+                if page_stats is None:
+                    image_ctm = field.draw(stripped_entry_string, field, draw_canvas)
+                else:
+                    start = time.perf_counter()
+                    image_ctm = field.draw(stripped_entry_string, field, draw_canvas)
+                    page_stats.record(render_stats.draw_stage(field.category),
+                                      time.perf_counter() - start)
+                draw_canvas.restoreState()
+                if image_ctm is None:
+                    canvas_used = True
+                else:
+                    images.append((stripped_entry_string, image_ctm))
 
-        draw_canvas.setFillColor(colors.black)
-        if draw_format.cmyk_color is not None:
-            c, m, y, k = draw_format.cmyk_color
-            draw_canvas.setFillColorCMYK(c, m, y, k)
-        elif draw_format.rgb_color is not None:
-            r, g, b = draw_format.rgb_color
-            draw_canvas.setFillColorRGB(r, g, b)
-
-        x_offset = draw_format.offset * units.cm
-        x_r_offset = draw_format.r_offset * units.cm
-        max_width = self.page_size.width - x_offset - x_r_offset
-        y_pos = draw_format.position * units.cm
-        spacing = draw_format.spacing * units.cm
-
-        typecase = draw_format.typecase
-        if typecase == metadata.DrawFormat.TYPECASE_DEFAULT:
-            cased_content = content
-        elif typecase == metadata.DrawFormat.TYPECASE_UPCASE:
-            cased_content = content.upper()
-        elif typecase == metadata.DrawFormat.TYPECASE_DOWNCASE:
-            cased_content = content.lower()
+        # Every field drawable by reportlab shares one canvas, so a page costs a
+        # single serialize/parse/merge cycle no matter how many fields it has.
+        if canvas_used:
+            self._timed(render_stats.draw_stage('canvas'), draw_canvas.save)
+            canvas_data = draw_buffer.getvalue()
         else:
-            cased_content = content
+            canvas_data = None
 
-        string_width = draw_canvas.stringWidth(cased_content, font_name, font_size)
+        return RenderedPage(canvas_data=canvas_data, images=images)
 
-        if string_width > max_width:
-            def calculate_width(text):
-                return draw_canvas.stringWidth(text, font_name, font_size)
-
-            if draw_format.overflow == metadata.DrawFormat.OVERFLOW_WRAP:
-                top, bottom = utils.split_text(
-                    cased_content,
-                    max_width,
-                    calculate_width
-                )
-            elif draw_format.overflow == metadata.DrawFormat.OVERFLOW_WRAPUP:
-                top, bottom = utils.split_text(
-                    cased_content,
-                    max_width,
-                    calculate_width,
-                    True
-                )
-                if bottom:
-                    y_pos += spacing
-            else:
-                top = cased_content
-                bottom = None
+    def _load_page_overlays(self, rendered_page):
+        overlays = []
 
-            if draw_format.overflow == metadata.DrawFormat.OVERFLOW_SHRINK:
-                adjusted_font_size = font_size * max_width / string_width
-                draw_canvas.setFont(font_name, adjusted_font_size)
-        else:
-            top = cased_content
-            bottom = None
-
-        alignment = draw_format.alignment
-        if alignment == metadata.DrawFormat.ALIGNMENT_CENTER:
-            x_pos = (self.page_size.width + x_offset - x_r_offset) / 2.0
-            draw_canvas.drawCentredString(x_pos, y_pos, top)
-            if bottom:
-                draw_canvas.drawCentredString(x_pos, y_pos - spacing, bottom)
-        elif alignment == metadata.DrawFormat.ALIGNMENT_LEFT:
-            x_pos = x_offset
-            draw_canvas.drawString(x_pos, y_pos, top)
-            if bottom:
-                draw_canvas.drawString(x_pos, y_pos - spacing, bottom)
-        elif alignment == metadata.DrawFormat.ALIGNMENT_RIGHT:
-            page_width = self.page_size.width
-            top_width = draw_canvas.stringWidth(top, font_name, font_size)
-            x_pos = page_width - x_offset - top_width
-            draw_canvas.drawString(x_pos, y_pos, top)
-            if bottom:
-                bottom_width = draw_canvas.stringWidth(bottom,
-                                                       font_name,
-                                                       font_size)
-                x_pos = page_width - x_offset - bottom_width
-                draw_canvas.drawString(x_pos, y_pos - spacing, bottom)
-
-        draw_canvas.save()
-        draw_buffer.seek(0)
-        return PyPDF2.PdfFileReader(draw_buffer)
-
-    def _draw_qr(self, content, draw_format):
-        draw_buffer = io.BytesIO();
-        draw_canvas = canvas.Canvas(draw_buffer, pagesize=self.page_size)
+        if rendered_page.canvas_data is not None:
+            canvas_reader = PyPDF2.PdfFileReader(io.BytesIO(rendered_page.canvas_data))
+            overlays.append(type(self).Overlay(page=canvas_reader.getPage(0),
+                                               ctm=None,
+                                               shared=False))
 
-        qr_color = colors.black
-        if draw_format.cmyk_color is not None:
-            c, m, y, k = draw_format.cmyk_color
-            qr_color = colors.CMYKColor(c, m, y, k)
-        elif draw_format.rgb_color is not None:
-            r, g, b = draw_format.rgb_color
-            qr_color = colors.Color(r, g, b)
-
-        qr_code = qr.QrCodeWidget(content,
-                                  barFillColor=qr_color,
-                                  barBorder=0)
-        qr_bounds = qr_code.getBounds()
-        qr_size = type(self).Size(qr_bounds[2] - qr_bounds[0],
-                                  qr_bounds[3] - qr_bounds[1])
-
-        size = draw_format.size * units.cm
-        d = shapes.Drawing(size, size, transform=[size / qr_size.width, 0, 0,
-                                                  size / qr_size.height, 0, 0])
-        d.add(qr_code)
-
-        x_pos = draw_format.offset * units.cm
-        y_pos = draw_format.position * units.cm
-        draw_canvas.setFillColor(colors.blue)
-        renderPDF.draw(d, draw_canvas, x_pos, y_pos)
-
-        draw_canvas.save()
-        draw_buffer.seek(0)
-        return PyPDF2.PdfFileReader(draw_buffer)
-
-    def _draw_bar(self, content, draw_format):
-        draw_buffer = io.BytesIO();
-        draw_canvas = canvas.Canvas(draw_buffer, pagesize=self.page_size)
+        for image_name, image_ctm in rendered_page.images:
+            image = self.assets.pdf(self._image_named(image_name))
+            overlays.append(type(self).Overlay(page=image.source,
+                                               ctm=image_ctm,
+                                               shared=True))
 
-        font_name = draw_format.font
-        font_size = draw_format.size
-        draw_canvas.setFont(font_name, font_size)
+        return overlays
 
-        content_uppercase = content.upper()
-        content_wide = '  '.join(list(content_uppercase))
+    def _draw_text(self, content, field, draw_canvas):
+        font_name = field.font
+        font_size = field.font_size
+        draw_canvas.setFont(font_name, font_size)
+        draw_canvas.setFillColor(field.fill_color)
 
-        x_pos = self.page_size.width / 2.0
-        y_pos = draw_format.position * units.cm
+        max_width = field.max_width
+        y_pos = field.y_pos
+        spacing = field.spacing
 
-        draw_canvas.drawCentredString(x_pos, y_pos, content_wide)
+        if field.typecase is None:
+            cased_content = content
+        else:
+            cased_content = field.typecase(content)
 
-        barcode = code39.Standard39(
-            content_uppercase,
-            barWidth=0.0075*units.inch*10.0/8.0,
-            barHeight=0.7*units.cm,
-            checksum=False
-        )
+        font_metrics = fonts.metrics(font_name)
 
-        x_pos = draw_format.offset * units.cm
-        y_pos -= 0.775 * units.cm
+        def calculate_width(text):
+            return font_metrics.string_width(text, font_size)
 
-        barcode.drawOn(draw_canvas, x_pos, y_pos)
+        string_width = calculate_width(cased_content)
 
-        draw_canvas.save()
-        draw_buffer.seek(0)
-        return PyPDF2.PdfFileReader(draw_buffer)
+        if string_width > max_width:
+            if field.shrink:
+                text_lines = [cased_content]
+                adjusted_font_size = font_size * max_width / string_width
+                draw_canvas.setFont(font_name, adjusted_font_size)
+            else:
+                inverse = field.wrap_inverse
+                if field.lines == 2:
+                    text_lines = [line for line in utils.split_text(cased_content,
+                                                                    max_width,
+                                                                    calculate_width,
+                                                                    inverse)
+                                  if line]
+                else:
+                    text_lines = utils.wrap_text(cased_content,
+                                                 max_width,
+                                                 field.lines,
+                                                 calculate_width,
+                                                 inverse)
+                if inverse:
+                    y_pos += spacing * (len(text_lines) - 1)
+        else:
+            text_lines = [cased_content]
 
-    def _draw_image(self, content, draw_format):
-        draw_buffer = io.BytesIO();
+        draw_line = field.draw_line
+        for line_index, line in enumerate(text_lines):
+            draw_line(draw_canvas, field, y_pos - line_index * spacing, line, calculate_width)
 
-        if content.endswith('.svg'):
-            draw_canvas = canvas.Canvas(draw_buffer, pagesize=self.page_size)
+    def _draw_qr(self, content, field, draw_canvas):
+        # Encoding is the costly part, so symbols are cached by content and
+        # only scaled into place here.
+        qr_code = self.symbols.qr(content, field.fill_color)
 
-            image = svg2rlg(self._image_named(content))
-            image_width = image.minWidth()
-            image_height = image.height
+        size = field.size
+        draw_canvas.translate(field.x_offset, field.y_pos)
+        draw_canvas.scale(size / qr_code.width, size / qr_code.height)
+        symbols.draw_symbol(draw_canvas, qr_code)
 
-            expected_height = draw_format.size * units.cm
-            expected_width = expected_height * image_width / image_height
+    def _draw_bar(self, content, field, draw_canvas):
+        draw_canvas.setFont(field.font, field.font_size)
 
-            x_pos = draw_format.offset * units.cm
-            y_pos = draw_format.position * units.cm
-            r_x_pos = draw_format.r_offset * units.cm
+        content_uppercase = content.upper()
+        content_wide = '  '.join(list(content_uppercase))
 
-            max_width = self.page_size.width - x_pos - r_x_pos
+        draw_canvas.drawCentredString(field.x_page_center, field.y_pos, content_wide)
 
-            if expected_width > max_width:
-                width = max_width
-                height = max_width * image_height / image_width
-            else:
-                width = expected_width
-                height = expected_height
+        barcode = self.symbols.code39(content_uppercase, plan.BAR_WIDTH, plan.BAR_HEIGHT)
 
-            image.width = width
-            image.height = height
-            image.scale(width / image_width, height / image_height)
+        draw_canvas.translate(field.x_offset, field.bar_y_pos)
+        symbols.draw_symbol(draw_canvas, barcode)
 
-            renderPDF.draw(image, draw_canvas, x_pos, y_pos)
-            draw_canvas.save()
+    def _draw_image(self, content, field, draw_canvas):
+        image_path = self._image_named(content)
+        if content.endswith('.svg'):
+            image = self.assets.svg(image_path)
         elif content.endswith('.pdf'):
-            image = PyPDF2.PdfFileReader(self._image_named(content))
-            image_page = image.getPage(0)
-            image_width = float(image_page.mediaBox[2])
-            image_height = float(image_page.mediaBox[3])
-
-            expected_height = draw_format.size * units.cm
-            expected_width = expected_height * image_width / image_height
-
-            x_pos = draw_format.offset * units.cm
-            y_pos = draw_format.position * units.cm
-            r_x_pos = draw_format.r_offset * units.cm
-
-            max_width = self.page_size.width - x_pos - r_x_pos
-
-            if expected_width > max_width:
-                width = max_width
-                height = max_width * image_height / image_width
-            else:
-                width = expected_width
-                height = expected_height
+            image = self.assets.pdf(image_path)
+        else:
+            image = self.assets.raster(image_path)
+        image_width = image.width
+        image_height = image.height
 
-            image_page.scaleTo(width=width, height=height)
+        expected_height = field.size
+        expected_width = expected_height * image_width / image_height
 
-            pdf_writer = PyPDF2.PdfFileWriter()
-            pdf_writer.addBlankPage(width=self.page_size.width, height=self.page_size.height)
+        x_pos = field.x_offset
+        y_pos = field.y_pos
+        max_width = field.max_width
 
-            page = pdf_writer.getPage(0)
-            page.mergeTranslatedPage(image_page, x_pos, y_pos)
-            pdf_writer.write(draw_buffer)
+        if expected_width > max_width:
+            width = max_width
+            height = max_width * image_height / image_width
         else:
-            draw_canvas = canvas.Canvas(draw_buffer, pagesize=self.page_size)
+            width = expected_width
+            height = expected_height
 
-            image = PIL.Image.open(self._image_named(content))
-            image_width, image_height = image.size
-
-            expected_height = draw_format.size * units.cm
-            expected_width = expected_height * image_width / image_height
+        if content.endswith('.svg'):
+            # The cached drawing is shared between fields, so it is scaled
+            # through the canvas instead of being resized in place.
+            draw_canvas.translate(x_pos, y_pos)
+            draw_canvas.scale(width / image_width, height / image_height)
+            # Only SVG images need reportlab's graphics stack.
+            from reportlab.graphics import renderPDF
+            renderPDF.draw(image.source, draw_canvas, 0, 0)
+        elif content.endswith('.pdf'):
+            # PDF pages cannot be drawn onto a reportlab canvas, so they are
+            # merged straight into the output page with a scale and translation.
+            return [width / image_width, 0, 0, height / image_height, x_pos, y_pos]
+        else:
+            draw_canvas.drawImage(image.source, x_pos, y_pos, width=width, height=height)
 
-            x_pos = draw_format.offset * units.cm
-            y_pos = draw_format.position * units.cm
-            r_x_pos = draw_format.r_offset * units.cm
+        return None
 
-            max_width = self.page_size.width - x_pos - r_x_pos
+    def _image_named(self, image_name):
+        return os.path.join(self.image_root_path, image_name)
 
-            if expected_width > max_width:
-                width = max_width
-                height = max_width * image_height / image_width
-            else:
-                width = expected_width
-                height = expected_height
 
-            draw_canvas.drawImage(ImageReader(image), x_pos, y_pos, width=width, height=height)
-            draw_canvas.save()
+def close_output(pdf_output, stats=None):
+    if stats is None:
+        pdf_output.close()
+        return
+    stats.timed(render_stats.STAGE_WRITE, pdf_output.close)
+    stats.count('pages', pdf_output.page_count)
+    stats.count('bytes_written', pdf_output.bytes_written)
+    stats.count('duplicate_images', pdf_output.duplicate_images)
+    stats.count('duplicate_fonts', pdf_output.duplicate_fonts)
 
-        draw_buffer.seek(0)
-        return PyPDF2.PdfFileReader(draw_buffer)
 
-    def _image_named(self, image_name):
-        return os.path.join(self.image_root_path, image_name)
+def _drain(output_stream):
+    data = output_stream.getvalue()
+    output_stream.seek(0)
+    output_stream.truncate()
+    return data
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+# Python Standard Library Imports
+import contextlib
+import os
+import tempfile
+
+
+def _umask():
+    # Reading the umask means setting it, so it is read once, at import,
+    # rather than while other threads may be creating files.
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+# mkstemp creates files only their owner can read. Finished files get the
+# mode open() would have given them instead, so caches and manifests can be
+# shared between users and build steps.
+FILE_MODE = 0o666 & ~_umask()
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode='wb'):
+    # Written to a temporary file next to path and moved into place in one
+    # step, so readers, and runs that fail halfway, never leave a partly
+    # written file behind.
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(file_descriptor, mode) as temporary_file:
+            yield temporary_file
+        os.chmod(temporary_path, FILE_MODE)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+
+# Python Standard Library Imports
+import collections
+import hashlib
+import os
+import pickle
+import threading
+import weakref
+
+# Third Party Library Imports
+import reportlab
+from reportlab import rl_config
+from reportlab.pdfbase import pdfdoc
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase import ttfonts
+
+# Local Imports
+from pdfgen import files
+
+FONT_EXTENSION = '.ttf'
+
+# Keys of the placeholder font objects overlays are written with, which the
+# stream writer replaces with one subset per font and code page per document.
+PAGED_FONT_KEY = '/PdfgenFont'
+PAGED_PAGE_KEY = '/PdfgenPage'
+PAGED_CODES_KEY = '/PdfgenCodes'
+
+FontSubset = collections.namedtuple('FontSubset', [
+    'base_font', 'widths', 'to_unicode', 'font_file',
+    'ascent', 'cap_height', 'descent', 'flags', 'bbox', 'italic_angle', 'stem_v',
+])
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+_registered = {}
+_registry_lock = threading.Lock()
+
+
+def font_files(font_root_path):
+    # Only lists the folder; nothing is parsed until a font is registered.
+    files = {}
+    for font_filename in os.listdir(font_root_path):
+        font_path = os.path.join(font_root_path, font_filename)
+        if os.path.isfile(font_path):
+            font_name, font_ext = os.path.splitext(os.path.basename(font_path))
+            if font_ext == FONT_EXTENSION:
+                files[font_name.replace(' ', '_')] = font_path
+    return files
+
+
+def layout_font_names(layout):
+    return {draw_format.font for draw_format in layout.values()
+            if draw_format.category in (draw_format.CATEGORY_TEXT, draw_format.CATEGORY_BAR)}
+
+
+def load_fonts(font_root_path, cache_path=None):
+    for font_name, font_path in sorted(font_files(font_root_path).items()):
+        register_font(font_name, font_path, cache_path)
+
+
+def load_layout_fonts(font_root_path, layout, cache_path=None):
+    # Fonts that are not in the folder, such as the standard PDF fonts, are
+    # left for reportlab to resolve.
+    files = font_files(font_root_path)
+    for font_name in sorted(layout_font_names(layout)):
+        if font_name in files:
+            register_font(font_name, files[font_name], cache_path)
+
+
+def register_font(font_name, font_path, cache_path=None):
+    # reportlab keeps the first font registered under a name, so a font is
+    # only ever parsed once per process.
+    with _registry_lock:
+        if font_name in _registered:
+            return _registered[font_name]
+        if cache_path is None:
+            font = PagedTTFont(font_name, font_path)
+        else:
+            font = CachedTTFont(font_name, load_face(font_path, cache_path))
+        pdfmetrics.registerFont(font)
+        _registered[font_name] = font
+        return font
+
+
+def load_face(font_path, cache_path):
+    # Parsed faces are pickled under a key that changes whenever the font
+    # file or the reportlab version does, so stale entries are never read.
+    stat = os.stat(font_path)
+    key = '{path}\0{mtime}\0{size}\0{version}'.format(path=os.path.abspath(font_path),
+                                                      mtime=stat.st_mtime_ns,
+                                                      size=stat.st_size,
+                                                      version=reportlab.Version)
+    face_path = os.path.join(cache_path,
+                             hashlib.sha1(key.encode('utf-8')).hexdigest() + '.pickle')
+    try:
+        with open(face_path, 'rb') as face_file:
+            return pickle.load(face_file)
+    except (IOError, OSError, EOFError, pickle.UnpicklingError):
+        pass
+
+    face = ttfonts.TTFontFace(font_path)
+    os.makedirs(cache_path, exist_ok=True)
+    with files.atomic_write(face_path) as face_file:
+        pickle.dump(face, face_file, protocol=pickle.HIGHEST_PROTOCOL)
+    return face
+
+
+class _PagedState(object):
+    # Stands in for TTFont.State, which reportlab reads the subsets and the
+    # internal name from. Subset n is code page n, whatever it holds.
+    namePrefix = 'F'
+
+    def __init__(self):
+        self.subsets = []
+        self.internalName = None
+        self.codes = {}
+
+
+class _PagedFontObject(pdfdoc.PDFTrueTypeFont):
+    local_attributes = [PAGED_FONT_KEY[1:], PAGED_PAGE_KEY[1:], PAGED_CODES_KEY[1:]]
+
+
+class PagedTTFont(ttfonts.TTFont):
+    # reportlab numbers the characters of a font in the order a document
+    # first uses them, so every overlay canvas embeds a subset of its own,
+    # and two overlays only share one if they used the same characters in
+    # the same order. Here a character's code is fixed by its code point
+    # instead: code page n holds U+n00 to U+nFF, at their low byte. Overlays
+    # only note the codes they use, and the writer embeds the union once
+    # per document, whichever process or run drew each overlay.
+    def splitString(self, text, doc, encoding='utf-8'):
+        state = self._paged_state(doc)
+        if not isinstance(text, str):
+            text = text.decode('utf-8')
+        results = []
+        current_page = -1
+        current = []
+        for code in map(ord, text):
+            if code == 0xa0:
+                # As reportlab does, a no-break space is drawn as a space.
+                code = 32
+            page = code >> 8
+            if page != current_page:
+                if current:
+                    results.append((current_page, bytes(current)))
+                current_page = page
+                current = []
+                page_codes = state.codes.get(page)
+                if page_codes is None:
+                    page_codes = state.codes[page] = set()
+                    if page >= len(state.subsets):
+                        state.subsets.extend([] for __ in range(page + 1 - len(state.subsets)))
+            page_codes.add(code & 0xff)
+            current.append(code & 0xff)
+        if current:
+            results.append((current_page, bytes(current)))
+        return results
+
+    def addObjects(self, doc):
+        state = self._paged_state(doc)
+        font_dictionary = doc.idToObject['BasicFonts'].dict
+        for page, codes in sorted(state.codes.items()):
+            internal_name = self.getSubsetInternalName(page, doc)[1:]
+            pdf_font = _PagedFontObject()
+            pdf_font.Name = internal_name
+            pdf_font.BaseFont = paged_font_name(self, page)
+            pdf_font.PdfgenFont = '({name})'.format(name=self.fontName.encode('utf-8').hex())
+            pdf_font.PdfgenPage = page
+            pdf_font.PdfgenCodes = '({codes})'.format(codes=bytes(sorted(codes)).hex())
+            doc.Reference(pdf_font, internal_name)
+            font_dictionary[internal_name] = pdf_font
+        del self.state[doc]
+
+    def _paged_state(self, doc):
+        state = self.state.get(doc)
+        if state is None:
+            state = self.state[doc] = _PagedState()
+        return state
+
+
+def paged_font_name(font, page):
+    face = font.face
+    return (ttfonts.SUBSETN(page) + b'+' + face.name + face.subfontNameX).decode('pdfdoc')
+
+
+def paged_subset(font_name, page, codes):
+    # The subset of a registered PagedTTFont holding the given codes of one
+    # code page. Unused codes up to the last one map to the missing glyph.
+    font = pdfmetrics.getFont(font_name)
+    face = font.face
+    base = page << 8
+    subset = [base + code if code in codes else 0 for code in range(max(codes) + 1)]
+    base_font = paged_font_name(font, page)
+    return FontSubset(base_font=base_font,
+                      widths=[face.getCharWidth(code) for code in subset],
+                      to_unicode=ttfonts.makeToUnicodeCMap(base_font, subset).encode('latin-1'),
+                      font_file=face.makeSubset(subset),
+                      ascent=face.ascent,
+                      cap_height=face.capHeight,
+                      descent=face.descent,
+                      flags=face.flags & ~ttfonts.FF_NONSYMBOLIC | ttfonts.FF_SYMBOLIC,
+                      bbox=face.bbox,
+                      italic_angle=face.italicAngle,
+                      stem_v=face.stemV)
+
+
+class CachedTTFont(PagedTTFont):
+    def __init__(self, name, face):
+        # Mirrors TTFont.__init__, with a face that has already been parsed.
+        self.fontName = name
+        self.face = face
+        self.encoding = ttfonts.TTEncoding()
+        self.state = weakref.WeakKeyDictionary()
+        self._asciiReadable = rl_config.ttfAsciiReadable
+
+
+class FontMetrics(object):
+    def __init__(self, font):
+        self.font = font
+        # Advance widths in thousandths of an em, filled in as characters
+        # are first seen, so a string is measured with one lookup per
+        # character instead of a pass through reportlab's font machinery.
+        self._widths = {}
+
+    @property
+    def font_name(self):
+        return self.font.fontName
+
+    def string_width(self, text, font_size):
+        widths = self._widths
+        try:
+            total = sum(map(widths.__getitem__, text))
+        except KeyError:
+            for char in set(text).difference(widths):
+                widths[char] = self.font.stringWidth(char, 1000)
+            total = sum(map(widths.__getitem__, text))
+        # Same order of operations as reportlab uses for TrueType fonts.
+        return 0.001 * font_size * total
+
+
+def metrics(font_name):
+    font_metrics = _metrics.get(font_name)
+    if font_metrics is None:
+        with _metrics_lock:
+            font_metrics = _metrics.get(font_name)
+            if font_metrics is None:
+                font_metrics = FontMetrics(pdfmetrics.getFont(font_name))
+                _metrics[font_name] = font_metrics
+    return font_metrics
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+# Python Standard Library Imports
+import itertools
+
+# Third Party Library Imports
+from PyPDF2 import generic
+from reportlab.lib import units
+
+# Local Imports
+from pdfgen import merge
+from pdfgen import sheets
+
+BADGE_PREFIX = '/PdfgenBadge'
+
+# Kept here for callers that set up imposition through this module.
+SHEET_SIZES = sheets.SHEET_SIZES
+Grid = sheets.Grid
+parse_sheet_size = sheets.parse_sheet_size
+parse_grid = sheets.parse_grid
+SheetLayout = sheets.SheetLayout
+
+
+class ImposedWriter(object):
+    # Stands in for a PdfStreamWriter and places each page it is given on a
+    # sheet as a Form XObject, writing sheets as they fill up. Only the
+    # badges of the sheets being filled are held, by reference.
+    def __init__(self, pdf_output, sheet_layout, badge_width, badge_height):
+        self._output = pdf_output
+        self.sheet_layout = sheet_layout
+        self.grid = sheet_layout.grid(badge_width, badge_height)
+        self.badge_count = 0
+        self._sides = [[], []] if sheet_layout.duplex else [[]]
+
+    @property
+    def slots(self):
+        return self.grid.columns * self.grid.rows
+
+    @property
+    def page_count(self):
+        return self._output.page_count
+
+    @property
+    def bytes_written(self):
+        return self._output.bytes_written
+
+    @property
+    def duplicate_images(self):
+        return self._output.duplicate_images
+
+    @property
+    def duplicate_fonts(self):
+        return self._output.duplicate_fonts
+
+    def share(self, pdf):
+        self._output.share(pdf)
+
+    def add_object(self, obj):
+        return self._output.add_object(obj)
+
+    def add_page(self, page):
+        # The badge is written straight away, so its overlay readers can go.
+        x_origin, y_origin = (float(value) for value in page.mediaBox.lowerLeft)
+        reference = self._output.add_object(merge.page_form(page))
+        side = self.badge_count % len(self._sides)
+        self._sides[side].append((reference, x_origin, y_origin))
+        self.badge_count += 1
+        if all(len(badges) == self.slots for badges in self._sides):
+            self._write_sheets()
+        return reference
+
+    def close(self):
+        if self._sides[0]:
+            self._write_sheets()
+        self._output.close()
+
+    def _write_sheets(self):
+        for side, badges in enumerate(self._sides):
+            if badges:
+                self._output.add_page(self._sheet(badges, back=side == 1))
+        self._sides = [[] for __ in self._sides]
+
+    def _sheet(self, badges, back=False):
+        grid = self.grid
+        content = []
+        xobjects = generic.DictionaryObject()
+        for index, (reference, x_origin, y_origin) in enumerate(badges):
+            row, column = divmod(index, grid.columns)
+            if back:
+                # Turned over from left to right, a badge's back lands
+                # behind its front from the mirrored column.
+                column = grid.columns - 1 - column
+            name = generic.NameObject('{prefix}{index}'.format(prefix=BADGE_PREFIX, index=index))
+            xobjects[name] = reference
+            content.append('q 1 0 0 1 {x} {y} cm {name} Do Q'.format(
+                x=_number(grid.column_positions[column] - x_origin),
+                y=_number(grid.row_positions[row] - y_origin),
+                name=name))
+        if self.sheet_layout.crop_marks and not back:
+            content.extend(self._crop_marks())
+
+        contents = generic.DecodedStreamObject()
+        contents.setData('\n'.join(content).encode('latin-1'))
+        return generic.DictionaryObject({
+            generic.NameObject('/MediaBox'): generic.ArrayObject([
+                generic.NumberObject(0), generic.NumberObject(0),
+                generic.FloatObject(_number(grid.sheet_width)),
+                generic.FloatObject(_number(grid.sheet_height)),
+            ]),
+            generic.NameObject('/Contents'): contents,
+            generic.NameObject('/Resources'): generic.DictionaryObject({
+                generic.NameObject('/XObject'): xobjects,
+            }),
+        })
+
+    def _crop_marks(self):
+        # Marks are drawn in the margin around the grid, in line with every
+        # cut, so they never run into a badge.
+        grid = self.grid
+        offset = self.sheet_layout.CROP_MARK_OFFSET * units.cm
+        length = self.sheet_layout.CROP_MARK_LENGTH * units.cm
+        left = grid.column_positions[0]
+        right = grid.column_positions[-1] + grid.badge_width
+        bottom = grid.row_positions[-1]
+        top = grid.row_positions[0] + grid.badge_height
+        x_cuts = sorted(set(itertools.chain.from_iterable(
+            (x, x + grid.badge_width) for x in grid.column_positions)))
+        y_cuts = sorted(set(itertools.chain.from_iterable(
+            (y, y + grid.badge_height) for y in grid.row_positions)))
+
+        # Each mark starts just off the grid and runs outwards, cut short at
+        # the sheet's edge, as (x, y, x direction, y direction, room left).
+        marks = []
+        for x in x_cuts:
+            marks.append((x, top + offset, 0, 1, grid.sheet_height - top - offset))
+            marks.append((x, bottom - offset, 0, -1, bottom - offset))
+        for y in y_cuts:
+            marks.append((left - offset, y, -1, 0, left - offset))
+            marks.append((right + offset, y, 1, 0, grid.sheet_width - right - offset))
+
+        lines = ['q 0 G {width} w'.format(width=_number(self.sheet_layout.CROP_MARK_WIDTH))]
+        for x, y, x_direction, y_direction, room in marks:
+            mark_length = min(length, room)
+            if mark_length > 0.0:
+                lines.append('{} {} m {} {} l S'.format(*(_number(value) for value in (
+                    x, y, x + x_direction * mark_length, y + y_direction * mark_length))))
+        lines.append('Q')
+        return lines
+
+
+def _number(value):
+    return '{value:.3f}'.format(value=value).rstrip('0').rstrip('.')
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+# Python Standard Library Imports
+import collections
+import json
+import os
+
+# Local Imports
+from pdfgen import batch
+from pdfgen import engine
+
+TEMPLATE_FOLDER = 'template'
+LAYOUT_FOLDER = 'layout'
+FONT_FOLDER = 'font'
+IMAGE_FOLDER = 'image'
+
+
+def load_config(config_path):
+    # The config lists the groups, each with a template and layout named
+    # after it, and the layout keys printed on each side of a badge.
+    with open(config_path, 'rt') as config_file:
+        config = json.load(config_file)
+    groups = config.get('group')
+    if not groups or not isinstance(groups, list) \
+            or not all(isinstance(group, str) and group for group in groups):
+        raise ValueError('Config group should be a list of group names')
+    order = config.get('order')
+    if not order or not isinstance(order, dict) \
+            or not all(isinstance(keys, list) for keys in order.values()):
+        raise ValueError('Config order should map each side to a list of keys')
+    return groups, collections.OrderedDict(order.items())
+
+
+class Job(object):
+    # Prints mixed records in a single document. Each record goes to the
+    # generator of its group, which stays warm for the whole job, and is
+    # printed on one page per side, in the order the config lists them.
+    DEFAULT_GROUP_KEY = 'group'
+
+    def __init__(self, config_path, font_root_path=None, image_root_path=None,
+                 group_key=DEFAULT_GROUP_KEY, stats=None, **generator_options):
+        root_path = os.path.dirname(os.path.abspath(config_path))
+        self.groups, self.sides = load_config(config_path)
+        self.group_key = group_key
+        self.stats = stats
+        if font_root_path is None:
+            font_root_path = os.path.join(root_path, FONT_FOLDER)
+        if image_root_path is None:
+            image_root_path = os.path.join(root_path, IMAGE_FOLDER)
+        self.generators = collections.OrderedDict(
+            (group, engine.PdfGenerator(
+                template_path=os.path.join(root_path, TEMPLATE_FOLDER, group + '.pdf'),
+                layout_path=os.path.join(root_path, LAYOUT_FOLDER, group + '.json'),
+                font_root_path=font_root_path,
+                image_root_path=image_root_path,
+                stats=stats,
+                **generator_options
+            ))
+            for group in self.groups
+        )
+
+    def group_of(self, record):
+        # Records without a group belong to the first one.
+        group = record.get(self.group_key)
+        if group is None or not str(group).strip():
+            return self.groups[0]
+        group = str(group).strip()
+        if group not in self.generators:
+            raise ValueError('Unknown group {group}'.format(group=group))
+        return group
+
+    def _check_imposition(self, imposition):
+        if imposition is None:
+            return
+        # Sheets hold a single grid, laid out for the first group's pages.
+        page_sizes = {tuple(round(length, 2) for length in pdf_generator.page_size)
+                      for pdf_generator in self.generators.values()}
+        if len(page_sizes) > 1:
+            raise ValueError('Imposed groups should have templates of the same page size')
+        self.generators[self.groups[0]]._check_imposition(imposition)
+
+    def record_pages(self, record, layout):
+        # Keys a group's layout does not have are left off its pages.
+        for keys in self.sides.values():
+            yield batch.record_page(record, layout,
+                                    [(key, key) for key in keys if key in layout])
+
+    def generate(self, records, filename, shared_template=False, imposition=None):
+        # Checked before the file is opened, so bad options leave it as it was.
+        self._check_imposition(imposition)
+        with open(filename, 'wb') as file_output_stream:
+            return self.generate_to(file_output_stream, records,
+                                    shared_template=shared_template, imposition=imposition)
+
+    def generate_to(self, output_stream, records, shared_template=False, imposition=None):
+        # Each side is printed on the template page of the same index, or on
+        # the first page of a template with fewer pages. Returns the number
+        # of records printed.
+        first_generator = self.generators[self.groups[0]]
+        self._check_imposition(imposition)
+        pdf_output = first_generator._open_output(output_stream, imposition)
+        shared_template = shared_template or imposition is not None
+        page_writers = {}
+        count = 0
+        for record in records:
+            group = self.group_of(record)
+            pdf_generator = self.generators[group]
+            if group not in page_writers:
+                page_writers[group] = pdf_generator._page_writer(pdf_output, shared_template)
+            for side_index, (entries, order) in enumerate(self.record_pages(record,
+                                                                            pdf_generator.layout)):
+                rendered_page = pdf_generator._render_page(entries=entries, order=order)
+                page_writers[group](rendered_page, side_index)
+            count += 1
+        engine.close_output(pdf_output, self.stats)
+        return count
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+# Python Standard Library Imports
+import collections
+import threading
+
+
+class LruCache(object):
+    # Keeps up to max_size values, dropping the least recently used first,
+    # and counts hits and misses for the rendering stats. A max_size of 0
+    # turns caching off. Each instance counts its own entries, not bytes.
+    DEFAULT_SIZE = 32
+
+    def __init__(self, max_size=None):
+        self.max_size = type(self).DEFAULT_SIZE if max_size is None else max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _get(self, key, load, *args):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return value
+            self.misses += 1
+
+        # Loading happens outside the lock, so threads only wait on each
+        # other for the bookkeeping.
+        value = load(*args)
+
+        if self.max_size > 0:
+            with self._lock:
+                self._entries[key] = value
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return value
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+
+# Python Standard Library Imports
+import base64
+
+# Third Party Library Imports
+from PyPDF2 import generic
+
+FORM_PREFIX = '/PdfgenOverlay'
+RESOURCE_CATEGORIES = ('/ExtGState', '/Font', '/XObject', '/ColorSpace', '/Pattern',
+                       '/Shading', '/Properties')
+
+
+class FormStore(object):
+    # Holds objects made while merging as indirect objects of their own, so
+    # a writer sharing the store writes each of them once per document.
+    def __init__(self):
+        self._objects = []
+
+    def add(self, obj):
+        self._objects.append(obj)
+        return generic.IndirectObject(len(self._objects), 0, self)
+
+    def getObject(self, reference):
+        return self._objects[reference.idnum - 1]
+
+
+def page_form(page):
+    # A Form XObject drawing the page with its own resources. A single
+    # encoded content stream is reused as is, and several are only decoded
+    # and joined, so the content is never parsed.
+    contents = page.getContents()
+    if isinstance(contents, generic.EncodedStreamObject):
+        form = _encoded_copy(contents)
+    else:
+        form = generic.DecodedStreamObject()
+        if isinstance(contents, generic.ArrayObject):
+            form.setData(b'\n'.join(_stream_data(stream.getObject()) for stream in contents))
+        elif contents is not None:
+            form.setData(contents.getData())
+    form.update({
+        generic.NameObject('/Type'): generic.NameObject('/XObject'),
+        generic.NameObject('/Subtype'): generic.NameObject('/Form'),
+        generic.NameObject('/BBox'): page.mediaBox,
+        generic.NameObject('/Resources'): page.raw_get('/Resources'),
+    })
+    return form
+
+
+def merge_overlays(page, overlays, store=None):
+    # Draws each (overlay page, form, matrix) over the page, in order. The
+    # page keeps its content streams and resources by reference and its
+    # content is wrapped in a save and restore, so nothing on it is decoded,
+    # parsed or renamed. An overlay without a form or matrix has its content
+    # streams appended and its resources added to the page's, as long as
+    # none of its resource names is taken; otherwise it is drawn as a Form
+    # XObject under a name the page does not use yet. New content streams go
+    # into the store when one is given.
+    if not overlays:
+        return page
+
+    resources = page['/Resources'].getObject()
+    merged_resources = generic.DictionaryObject()
+    for key in resources:
+        merged_resources[generic.NameObject(key)] = resources.raw_get(key)
+    # Categories copied from the page's own, which may be shared with the
+    # template and so are never added to in place.
+    copied_categories = set()
+    merged_contents = generic.ArrayObject([SAVE_STATE])
+    merged_contents.extend(_content_references(page))
+    merged_contents.append(RESTORE_STATE)
+    annotations = _annotations(page)
+
+    form_index = 0
+    for overlay_page, form, ctm in overlays:
+        overlay_resources = overlay_page['/Resources'].getObject()
+        if form is None and ctm is None and _resources_fit(merged_resources, overlay_resources):
+            _add_resources(merged_resources, overlay_resources, copied_categories)
+            merged_contents.append(SAVE_STATE)
+            merged_contents.extend(_inline_contents(overlay_page, store))
+            merged_contents.append(RESTORE_STATE)
+        else:
+            if form is None:
+                form = page_form(overlay_page)
+            xobjects = _copied_category(merged_resources, '/XObject', copied_categories)
+            while '{prefix}{index}'.format(prefix=FORM_PREFIX, index=form_index) in xobjects:
+                form_index += 1
+            name = generic.NameObject('{prefix}{index}'.format(prefix=FORM_PREFIX,
+                                                                 index=form_index))
+            xobjects[name] = form
+            if ctm is None:
+                drawing = '{name} Do\n'.format(name=name)
+            else:
+                # Written the way mergeTransformedPage() writes its matrix.
+                matrix = ' '.join(repr(generic.FloatObject(value)) for value in ctm)
+                drawing = 'q {matrix} cm {name} Do Q\n'.format(matrix=matrix, name=name)
+            merged_contents.append(_content_stream(drawing.encode('latin-1'), store))
+        # Forms cannot hold annotations, so an overlay's links are moved
+        # onto the page the way mergePage() does.
+        annotations.extend(_annotations(overlay_page))
+
+    page[generic.NameObject('/Contents')] = merged_contents
+    page[generic.NameObject('/Resources')] = merged_resources
+    if annotations:
+        page[generic.NameObject('/Annots')] = annotations
+    return page
+
+
+def _content_references(page):
+    if '/Contents' not in page:
+        return []
+    contents = page.raw_get('/Contents')
+    if isinstance(contents.getObject(), generic.ArrayObject):
+        return list(contents.getObject())
+    return [contents]
+
+
+def _inline_contents(page, store):
+    contents = _content_references(page)
+    if len(contents) == 1 and _is_ascii85(contents[0].getObject()):
+        stream_copy = _encoded_copy(contents[0].getObject())
+        return [stream_copy if store is None else store.add(stream_copy)]
+    return contents
+
+
+def _annotations(page):
+    if '/Annots' not in page:
+        return generic.ArrayObject()
+    return generic.ArrayObject(page['/Annots'].getObject())
+
+
+def _resources_fit(resources, overlay_resources):
+    for category in RESOURCE_CATEGORIES:
+        if category not in overlay_resources or category not in resources:
+            continue
+        names = resources[category].getObject()
+        overlay_names = overlay_resources[category].getObject()
+        for name in overlay_names:
+            if name in names and names.raw_get(name) != overlay_names.raw_get(name):
+                return False
+    return True
+
+
+def _add_resources(resources, overlay_resources, copied_categories):
+    for category in RESOURCE_CATEGORIES:
+        if category not in overlay_resources:
+            continue
+        if category not in resources:
+            resources[generic.NameObject(category)] = overlay_resources.raw_get(category)
+            continue
+        names = _copied_category(resources, category, copied_categories)
+        overlay_names = overlay_resources[category].getObject()
+        for name in overlay_names:
+            names[generic.NameObject(name)] = overlay_names.raw_get(name)
+    if '/ProcSet' in overlay_resources:
+        # Sorted, so that identical input gives identical bytes.
+        procedures = set(resources.get('/ProcSet', generic.ArrayObject()).getObject())
+        procedures.update(overlay_resources['/ProcSet'].getObject())
+        resources[generic.NameObject('/ProcSet')] = generic.ArrayObject(sorted(procedures))
+
+
+def _copied_category(resources, category, copied_categories):
+    if category in copied_categories:
+        return resources[category]
+    names = generic.DictionaryObject()
+    if category in resources:
+        original_names = resources[category].getObject()
+        for name in original_names:
+            names[generic.NameObject(name)] = original_names.raw_get(name)
+    resources[generic.NameObject(category)] = names
+    copied_categories.add(category)
+    return names
+
+
+def _is_ascii85(stream):
+    filters = stream.get('/Filter')
+    return isinstance(filters, generic.ArrayObject) and len(filters) > 1 \
+        and filters[0] == '/ASCII85Decode' and '/DecodeParms' not in stream
+
+
+def _encoded_copy(stream):
+    # reportlab wraps its compressed streams in ASCII85, which takes a
+    # quarter more space than the binary data it encodes, so copies drop it.
+    stream_copy = generic.EncodedStreamObject()
+    stream_copy._data = stream._data
+    for key in ('/Filter', '/DecodeParms'):
+        if key in stream:
+            stream_copy[generic.NameObject(key)] = stream.raw_get(key)
+    if _is_ascii85(stream_copy):
+        filters = stream_copy['/Filter']
+        stream_copy._data = base64.a85decode(stream_copy._data.strip(), adobe=True)
+        stream_copy[generic.NameObject('/Filter')] = \
+            generic.ArrayObject(filters[1:]) if len(filters) > 2 else filters[1]
+    return stream_copy
+
+
+def _stream_data(stream):
+    if _is_ascii85(stream):
+        stream = _encoded_copy(stream)
+    return stream.getData()
+
+
+def _content_stream(data, store=None):
+    stream = generic.DecodedStreamObject()
+    stream.setData(data)
+    if store is None:
+        return stream
+    return store.add(stream)
+
+
+# Every merged page saves and restores the graphics state around each part,
+# with streams kept in a store of their own so that a document writes them
+# once.
+CONSTANTS = FormStore()
+SAVE_STATE = _content_stream(b'q\n', CONSTANTS)
+RESTORE_STATE = _content_stream(b'Q\n', CONSTANTS)
@@ -26,7 +26,8 @@ class DrawFormat(object):
                  cmyk_color=None, rgb_color=None,
                  offset=None, r_offset=None,
                  position=None, font=None, size=None,
-                 overflow=None, spacing=None, typecase=None):
+                 overflow=None, spacing=None, lines=None, typecase=None,
+                 value=None):
         # Defaults
         self._category = type(self).CATEGORY_TEXT
         self._alignment = type(self).ALIGNMENT_CENTER
@@ -39,7 +40,9 @@ class DrawFormat(object):
         self._size = 8.0
         self._overflow = type(self).OVERFLOW_WRAP
         self._spacing = 0.5
+        self._lines = 2
         self._typecase = type(self).TYPECASE_DEFAULT
+        self._value = None
 
         self.name = name
         self.category = category
@@ -53,7 +56,9 @@ class DrawFormat(object):
         self.size = size
         self.overflow = overflow
         self.spacing = spacing
+        self.lines = lines
         self.typecase = typecase
+        self.value = value
 
     @property
     def category(self):
@@ -170,6 +175,16 @@ class DrawFormat(object):
         if new_spacing is not None:
             self._spacing = new_spacing
 
+    @property
+    def lines(self):
+        return self._lines
+
+    @lines.setter
+    def lines(self, value):
+        new_lines = self._validate_non_negative_float(value)
+        if new_lines is not None and new_lines >= 1:
+            self._lines = int(new_lines)
+
     @property
     def typecase(self):
         return self._typecase
@@ -179,6 +194,15 @@ class DrawFormat(object):
         if value in type(self).valid_typecases():
             self._typecase = value
 
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        if value and isinstance(value, str) and value.strip():
+            self._value = value.strip()
+
     @classmethod
     def valid_categories(cls):
         return [cls.CATEGORY_TEXT,
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+# Python Standard Library Imports
+import collections
+import hashlib
+import os
+import pickle
+import threading
+
+# Local Imports
+from pdfgen import files
+
+OVERLAY_EXTENSION = '.overlay'
+
+
+def digest(*parts):
+    # Parts are joined with a separator that cannot appear in any of them,
+    # so different parts never hash alike.
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update(str(part).encode('utf-8', 'surrogatepass'))
+        hasher.update(b'\0')
+    return hasher.hexdigest()
+
+
+def file_fingerprint(path):
+    # Changes whenever the file is replaced or edited in place.
+    stat = os.stat(path)
+    return '{path}:{size}:{mtime}'.format(path=os.path.abspath(path),
+                                          size=stat.st_size,
+                                          mtime=stat.st_mtime_ns)
+
+
+class OverlayCache(object):
+    # Rendered record overlays on disk, keyed by a digest of everything that
+    # goes into drawing them. Files are used in least recently used order,
+    # which is tracked through their modification times so that it carries
+    # over between runs, and the oldest go once the total size passes
+    # max_size bytes. Processes sharing a folder each keep their own count of
+    # its size, so together they may briefly go over.
+    DEFAULT_SIZE = 256 * 1024 * 1024
+
+    def __init__(self, cache_path, max_size=DEFAULT_SIZE):
+        self.cache_path = cache_path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = None
+        self._total_size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._index())
+
+    @property
+    def total_size(self):
+        with self._lock:
+            self._index()
+            return self._total_size
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as overlay_file:
+                overlay = pickle.load(overlay_file)
+            os.utime(path)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            entries = self._index()
+            if key in entries:
+                entries.move_to_end(key)
+        return overlay
+
+    def put(self, key, overlay):
+        os.makedirs(self.cache_path, exist_ok=True)
+        with files.atomic_write(self._path(key)) as overlay_file:
+            pickle.dump(overlay, overlay_file, protocol=pickle.HIGHEST_PROTOCOL)
+            size = overlay_file.tell()
+
+        with self._lock:
+            entries = self._index()
+            self._total_size += size - entries.pop(key, 0)
+            entries[key] = size
+            self._trim()
+
+    def clear(self):
+        with self._lock:
+            for key in self._index():
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self._entries = collections.OrderedDict()
+            self._total_size = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_path, key + OVERLAY_EXTENSION)
+
+    def _trim(self):
+        entries = self._entries
+        while self._total_size > self.max_size and entries:
+            evicted_key, evicted_size = entries.popitem(last=False)
+            self._total_size -= evicted_size
+            try:
+                os.remove(self._path(evicted_key))
+            except OSError:
+                pass
+
+    def _index(self):
+        # The folder is listed once, oldest first, and kept up to date after.
+        # A folder left over the size by an earlier run is trimmed then.
+        if self._entries is None:
+            files = []
+            if os.path.isdir(self.cache_path):
+                for filename in os.listdir(self.cache_path):
+                    key, extension = os.path.splitext(filename)
+                    if extension == OVERLAY_EXTENSION:
+                        stat = os.stat(os.path.join(self.cache_path, filename))
+                        files.append((stat.st_mtime_ns, key, stat.st_size))
+            self._entries = collections.OrderedDict(
+                (key, size) for __, key, size in sorted(files)
+            )
+            self._total_size = sum(self._entries.values())
+            self._trim()
+        return self._entries
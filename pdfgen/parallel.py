@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+# Python Standard Library Imports
+import collections
+import itertools
+import multiprocessing
+import os
+
+# Records are shipped to workers in fixed-size chunks. The chunk size does not
+# depend on the number of workers, so neither does the output.
+DEFAULT_CHUNK_SIZE = 16
+
+_worker_generator = None
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def _initialize_worker(generator_class, generator_args):
+    global _worker_generator
+    _worker_generator = generator_class(*generator_args)
+
+
+def _render_chunk(pages):
+    return [_worker_generator._render_page(entries=entries, order=order)
+            for entries, order in pages]
+
+
+def _generate_chunk(jobs, generate_options):
+    for entries, order, filename in jobs:
+        _worker_generator.generate([entries], [order], filename, **generate_options)
+    return len(jobs)
+
+
+def _chunked(iterable, chunk_size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _map_ordered(generator_class, generator_args, function, items,
+                 workers, chunk_size, function_args=()):
+    # Only a bounded window of chunks is in flight at once, so the input is
+    # consumed as fast as the workers keep up and results come back in order.
+    pool = multiprocessing.Pool(workers,
+                                initializer=_initialize_worker,
+                                initargs=(generator_class, generator_args))
+    try:
+        pending = collections.deque()
+        for chunk in _chunked(items, chunk_size):
+            pending.append(pool.apply_async(function, (chunk,) + function_args))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+    except BaseException:
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+
+
+def render_pages(generator_class, generator_args, pages, workers,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+    for rendered_chunk in _map_ordered(generator_class, generator_args,
+                                       _render_chunk, pages,
+                                       workers, chunk_size):
+        for rendered_page in rendered_chunk:
+            yield rendered_page
+
+
+def generate_files(generator_class, generator_args, jobs, workers,
+                   chunk_size=DEFAULT_CHUNK_SIZE, generate_options=None):
+    return sum(_map_ordered(generator_class, generator_args,
+                            _generate_chunk, jobs,
+                            workers, chunk_size,
+                            function_args=(generate_options or {},)))
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+# Python Standard Library Imports
+import collections
+
+# Third Party Library Imports
+from reportlab.lib import colors
+from reportlab.lib import units
+
+# Local Imports
+from pdfgen import metadata
+
+_TYPECASES = {
+    metadata.DrawFormat.TYPECASE_DEFAULT: None,
+    metadata.DrawFormat.TYPECASE_UPCASE: str.upper,
+    metadata.DrawFormat.TYPECASE_DOWNCASE: str.lower,
+}
+
+# Code 39 bars are drawn at a fixed size, below the spaced out text.
+BAR_WIDTH = 0.0075 * units.inch * 10.0 / 8.0
+BAR_HEIGHT = 0.7 * units.cm
+BAR_DROP = 0.775 * units.cm
+
+
+# Each line of a text field is drawn by the routine for its alignment, given
+# the canvas, the field, the line's baseline, the line and a width function.
+def _draw_centred_line(draw_canvas, field, y_pos, line, calculate_width):
+    draw_canvas.drawCentredString(field.x_center, y_pos, line)
+
+
+def _draw_left_line(draw_canvas, field, y_pos, line, calculate_width):
+    draw_canvas.drawString(field.x_offset, y_pos, line)
+
+
+def _draw_right_line(draw_canvas, field, y_pos, line, calculate_width):
+    draw_canvas.drawString(field.x_right - calculate_width(line), y_pos, line)
+
+
+_LINE_ROUTINES = {
+    metadata.DrawFormat.ALIGNMENT_CENTER: _draw_centred_line,
+    metadata.DrawFormat.ALIGNMENT_LEFT: _draw_left_line,
+    metadata.DrawFormat.ALIGNMENT_RIGHT: _draw_right_line,
+}
+
+
+class FieldPlan(collections.namedtuple('FieldPlan', [
+    'category',
+    'draw',
+    'shrink',
+    'wrap_inverse',
+    'draw_line',
+    'typecase',
+    'fill_color',
+    'font',
+    'font_size',
+    'size',
+    'x_offset',
+    'x_center',
+    'x_right',
+    'x_page_center',
+    'max_width',
+    'y_pos',
+    'bar_y_pos',
+    'spacing',
+    'lines',
+    'value',
+])):
+    # Lengths are in points and colors are reportlab colors, so drawing a
+    # field never converts units or re-validates the layout.
+    __slots__ = ()
+
+
+def resolve_color(draw_format):
+    if draw_format.cmyk_color is not None:
+        c, m, y, k = draw_format.cmyk_color
+        return colors.CMYKColor(c, m, y, k)
+    elif draw_format.rgb_color is not None:
+        r, g, b = draw_format.rgb_color
+        return colors.Color(r, g, b)
+    return colors.black
+
+
+def compile_format(draw_format, page_width, draw):
+    x_offset = draw_format.offset * units.cm
+    x_r_offset = draw_format.r_offset * units.cm
+    return FieldPlan(
+        category=draw_format.category,
+        draw=draw,
+        shrink=draw_format.overflow == metadata.DrawFormat.OVERFLOW_SHRINK,
+        wrap_inverse=draw_format.overflow == metadata.DrawFormat.OVERFLOW_WRAPUP,
+        draw_line=_LINE_ROUTINES[draw_format.alignment],
+        typecase=_TYPECASES.get(draw_format.typecase),
+        fill_color=resolve_color(draw_format),
+        font=draw_format.font,
+        font_size=draw_format.size,
+        size=draw_format.size * units.cm,
+        x_offset=x_offset,
+        x_center=(page_width + x_offset - x_r_offset) / 2.0,
+        x_right=page_width - x_offset,
+        x_page_center=page_width / 2.0,
+        max_width=page_width - x_offset - x_r_offset,
+        y_pos=draw_format.position * units.cm,
+        bar_y_pos=draw_format.position * units.cm - BAR_DROP,
+        spacing=draw_format.spacing * units.cm,
+        lines=draw_format.lines,
+        value=draw_format.value,
+    )
+
+
+def compile_layout(layout, page_width, draw_routines):
+    return {key: compile_format(draw_format, page_width, draw_routines[draw_format.category])
+            for key, draw_format in layout.items()}
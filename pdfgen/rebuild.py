@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+# Python Standard Library Imports
+import collections
+import json
+import os
+
+# Local Imports
+from pdfgen import batch
+from pdfgen import engine
+from pdfgen import files
+from pdfgen import overlays
+from pdfgen import writer
+
+MANIFEST_SUFFIX = '.manifest.json'
+MANIFEST_VERSION = 2
+
+Rebuild = collections.namedtuple('Rebuild', ['records', 'rendered', 'kept', 'removed', 'updated'])
+
+
+def manifest_path(output_file):
+    return output_file + MANIFEST_SUFFIX
+
+
+def load_manifest(path):
+    # A missing, unreadable or outdated manifest means a full rebuild.
+    try:
+        with open(path, 'rt') as manifest_file:
+            manifest = json.load(manifest_file)
+    except (IOError, OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_manifest(path, manifest):
+    # Replaced in one step, so a run that fails halfway leaves the last
+    # complete manifest behind.
+    with files.atomic_write(path, 'wt') as manifest_file:
+        json.dump(manifest, manifest_file)
+
+
+class BatchRebuilder(object):
+    # Keeps a batch document up to date with its records. A manifest next to
+    # the output maps each record's key and content hash to the object number
+    # of its page, and a rerun appends an incremental update that draws only
+    # new and changed records, keeps the pages of unchanged ones by reference
+    # and drops those of removed ones. The hash covers the template page a
+    # record is printed on, so on a template with several pages, records
+    # moving to another template page are drawn again. Once dropped pages
+    # outnumber live ones the document is written from scratch instead, so
+    # it does not keep growing.
+    COMPACT_RATIO = 1.0
+
+    def __init__(self, pdf_generator, output_file, keys=None, record_key=None,
+                 shared_template=False, manifest_file=None):
+        self.pdf_generator = pdf_generator
+        self.output_file = output_file
+        self.mapping = batch.parse_key_mapping(keys, pdf_generator.layout)
+        # The column identifying a record. With one, a page is only kept for
+        # the record it was drawn for; without one, records are told apart by
+        # their row number and any page with the same content is kept.
+        self.record_key = record_key
+        self.shared_template = shared_template
+        self.manifest_file = manifest_path(output_file) if manifest_file is None \
+            else manifest_file
+
+    @property
+    def fingerprint(self):
+        return overlays.digest(self.pdf_generator.overlay_fingerprint, self.mapping,
+                               self.shared_template)
+
+    def rebuild(self, records):
+        manifest = self._usable_manifest()
+        if manifest is None:
+            with open(self.output_file, 'wb') as output_stream:
+                return self._write(records, output_stream, None)
+        with open(self.output_file, 'r+b') as output_stream:
+            output_stream.seek(manifest['revision'][0])
+            return self._write(records, output_stream, manifest)
+
+    def _usable_manifest(self):
+        manifest = load_manifest(self.manifest_file)
+        if manifest is None or manifest.get('fingerprint') != self.fingerprint:
+            return None
+        # The document must be the one the manifest was written for.
+        try:
+            stat = os.stat(self.output_file)
+        except OSError:
+            return None
+        if [stat.st_size, stat.st_mtime_ns] != manifest.get('output'):
+            return None
+        dropped_pages = manifest['pages_written'] - len(manifest['records'])
+        if dropped_pages > type(self).COMPACT_RATIO * len(manifest['records']):
+            return None
+        return manifest
+
+    def _match_key(self, record_key, content_hash):
+        if self.record_key is None:
+            return content_hash
+        return (str(record_key), content_hash)
+
+    def _write(self, records, output_stream, manifest):
+        pdf_generator = self.pdf_generator
+        if manifest is None:
+            previous = None
+            pages_written = 0
+            old_pages = {}
+        else:
+            previous = writer.Revision(*manifest['revision'])
+            pages_written = manifest['pages_written']
+            old_pages = collections.defaultdict(collections.deque)
+            for record_key, content_hash, page_number in manifest['records']:
+                if content_hash is not None:
+                    old_pages[self._match_key(record_key, content_hash)].append(page_number)
+        pdf_output = writer.PdfStreamWriter(output_stream, previous=previous)
+        write_page = pdf_generator._page_writer(pdf_output, self.shared_template)
+
+        # Pages are matched by content, so records that only moved are kept
+        # too, and the updated document lists them in the new order.
+        manifest_records = []
+        rendered = 0
+        for index, record in enumerate(records, start=1):
+            entries, order = batch.record_page(record, pdf_generator.layout, self.mapping)
+            content_hash = pdf_generator._overlay_key(entries, order)
+            if content_hash is not None:
+                content_hash = overlays.digest(content_hash,
+                                               pdf_generator.template.page_index(index - 1))
+            record_key = index if self.record_key is None else record.get(self.record_key)
+            old_numbers = old_pages.get(self._match_key(record_key, content_hash))
+            if old_numbers:
+                page_number = old_numbers.popleft()
+                pdf_output.keep_page(page_number)
+            else:
+                rendered_page = pdf_generator._render_page(entries=entries, order=order)
+                page_number = write_page(rendered_page, index - 1).idnum
+                rendered += 1
+            manifest_records.append([record_key, content_hash, page_number])
+        removed = sum(len(numbers) for numbers in old_pages.values())
+
+        page_numbers = [page_number for __, __, page_number in manifest_records]
+        unchanged = manifest is not None and \
+            page_numbers == [page_number for __, __, page_number in manifest['records']]
+        if unchanged:
+            # Nothing is appended when every page stays where it was.
+            revision = manifest['revision']
+        else:
+            engine.close_output(pdf_output, pdf_generator.stats)
+            output_stream.flush()
+            revision = list(pdf_output.revision)
+        if not unchanged or manifest_records != manifest['records']:
+            stat = os.fstat(output_stream.fileno())
+            save_manifest(self.manifest_file, {
+                'version': MANIFEST_VERSION,
+                'fingerprint': self.fingerprint,
+                'revision': revision,
+                'output': [stat.st_size, stat.st_mtime_ns],
+                'pages_written': pages_written + rendered,
+                'records': manifest_records,
+            })
+        return Rebuild(records=len(manifest_records), rendered=rendered,
+                       kept=len(manifest_records) - rendered, removed=removed,
+                       updated=manifest is not None)
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+
+# Python Standard Library Imports
+import collections
+import http.server
+import json
+import logging
+import math
+import os
+import signal
+import socketserver
+import stat
+import sys
+import threading
+import time
+
+# Local Imports
+from pdfgen import batch
+from pdfgen import engine
+from pdfgen import metadata
+
+logger = logging.getLogger(__name__)
+
+UNIX_PREFIX = 'unix:'
+
+
+class RequestError(ValueError):
+    pass
+
+
+class RenderService(object):
+    DEFAULT_MAX_GENERATORS = 16
+    DEFAULT_LATENCY_WINDOW = 1000
+
+    def __init__(self, template_path=None, layout_path=None,
+                 font_root_path=None, image_root_path=None,
+                 max_generators=DEFAULT_MAX_GENERATORS,
+                 latency_window=DEFAULT_LATENCY_WINDOW, **generator_options):
+        self.defaults = {
+            'template': template_path,
+            'layout': layout_path,
+            'fonts': font_root_path,
+            'images': image_root_path,
+        }
+        # Requests may only name files next to the server's template and
+        # layout, and folders inside its font and image folders.
+        self.roots = {
+            name: os.path.realpath(os.path.dirname(path) if name in ('template', 'layout') else path)
+            for name, path in self.defaults.items()
+            if path is not None
+        }
+        # Passed on to every generator, such as font_cache_path or stats.
+        self.generator_options = generator_options
+        self.max_generators = max_generators
+        self.requests = 0
+        self.errors = 0
+        self._generators = collections.OrderedDict()
+        self._latencies = collections.deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+
+    def generator(self, template_path, layout_path, font_root_path, image_root_path):
+        # Generators stay warm per (template, layout, fonts, images) set. A
+        # generator renders one request at a time, so each comes with a lock.
+        key = (template_path, layout_path, font_root_path, image_root_path)
+        with self._lock:
+            entry = self._generators.get(key)
+            if entry is not None:
+                self._generators.move_to_end(key)
+                return entry
+        pdf_generator = engine.PdfGenerator(*key, **self.generator_options)
+        with self._lock:
+            entry = self._generators.setdefault(key, (pdf_generator, threading.Lock()))
+            while len(self._generators) > self.max_generators:
+                self._generators.popitem(last=False)
+        return entry
+
+    def render(self, request):
+        start = time.perf_counter()
+        try:
+            pdf_bytes = self._render(request)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        latency = time.perf_counter() - start
+        with self._lock:
+            self.requests += 1
+            self._latencies.append(latency)
+        logger.debug('Rendered {size} bytes in {latency:.1f} ms'.format(
+            size=len(pdf_bytes), latency=latency * 1000.0))
+        return pdf_bytes
+
+    def _render(self, request):
+        if not isinstance(request, dict):
+            raise RequestError('Request should be a JSON object')
+        paths = [self._request_path(name, request.get(name))
+                 for name in ('template', 'layout', 'fonts', 'images')]
+        pdf_generator, generator_lock = self.generator(*paths)
+
+        if 'records' in request:
+            records = request['records']
+            if not isinstance(records, list) \
+                    or not all(isinstance(record, dict) for record in records):
+                raise RequestError('Records should be a list of JSON objects')
+            mapping = batch.parse_key_mapping(request.get('keys'), pdf_generator.layout)
+            pages = [batch.record_page(record, pdf_generator.layout, mapping)
+                     for record in records]
+        elif 'entries' in request and 'keys' in request:
+            entries = request['entries']
+            keys = request['keys']
+            if not _is_string_list(keys):
+                raise RequestError('Keys should be a list of strings')
+            # Entries are one page, or a list of pages, each in the order of the keys.
+            if _is_string_list(entries):
+                entries = [entries]
+            elif not isinstance(entries, list) or not entries \
+                    or not all(_is_string_list(page_entries) for page_entries in entries):
+                raise RequestError('Entries should be a list of strings, or a list of lists of strings')
+            if any(len(page_entries) != len(keys) for page_entries in entries):
+                raise RequestError('Entries and keys should have the same number of elements')
+            pages = [(page_entries, keys) for page_entries in entries]
+        else:
+            raise RequestError('Request should have either records or entries and keys')
+
+        for __, order in pages:
+            for key in order:
+                if key not in pdf_generator.layout:
+                    raise RequestError('Key {key} does not exist in the layout'.format(key=key))
+        for entries, order in pages:
+            self._check_images(entries, order, pdf_generator)
+
+        with generator_lock:
+            return pdf_generator.generate_bytes([entries for entries, __ in pages],
+                                                [order for __, order in pages],
+                                                shared_template=bool(request.get('shared_template')))
+
+    def _request_path(self, name, value):
+        if not value:
+            return self.defaults[name]
+        if not isinstance(value, str) or name not in self.roots:
+            raise RequestError('Request cannot name its own {name}'.format(name=name))
+        root = self.roots[name]
+        path = os.path.realpath(os.path.join(root, value))
+        if os.path.commonpath([root, path]) != root:
+            raise RequestError('Request {name} should be inside the server\'s {name} folder'.format(
+                name=name))
+        return path
+
+    def _check_images(self, entries, order, pdf_generator):
+        # Image fields name files in the generator's image folder, and a
+        # record naming one outside it is refused like any other path.
+        for key, entry in zip(order, entries):
+            image_name = entry.strip()
+            if not image_name or pdf_generator.layout[key].category != metadata.DrawFormat.CATEGORY_IMAGE:
+                continue
+            if pdf_generator.image_root_path is None:
+                raise RequestError('Request cannot show images without an image folder')
+            root = os.path.realpath(pdf_generator.image_root_path)
+            path = os.path.realpath(os.path.join(root, image_name))
+            if os.path.commonpath([root, path]) != root:
+                raise RequestError('Image {name} should be inside the image folder'.format(
+                    name=image_name))
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {
+                'requests': self.requests,
+                'errors': self.errors,
+                'generators': len(self._generators),
+            }
+        stats['latency_ms'] = {
+            'p50': _percentile(latencies, 50) * 1000.0,
+            'p99': _percentile(latencies, 99) * 1000.0,
+            'max': (latencies[-1] if latencies else 0.0) * 1000.0,
+        }
+        render_stats = self.generator_options.get('stats')
+        if render_stats is not None:
+            stats['render'] = render_stats.as_dict()
+        return stats
+
+
+def _is_string_list(value):
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+def _percentile(values, percent):
+    if not values:
+        return 0.0
+    rank = int(math.ceil(percent / 100.0 * len(values)))
+    return values[max(rank, 1) - 1]
+
+
+class RenderRequestHandler(http.server.BaseHTTPRequestHandler):
+    server_version = 'TinkertankerPdfgen'
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self._send_json(200, self.server.service.stats())
+        elif self.path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        else:
+            self._send_json(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        if self.path != '/render':
+            self._send_json(404, {'error': 'Not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length).decode('utf-8'))
+            pdf_bytes = self.server.service.render(request)
+        except (ValueError, KeyError, TypeError) as error:
+            self._send_json(400, {'error': str(error)})
+        except (IOError, OSError) as error:
+            self._send_json(404, {'error': str(error)})
+        except Exception as error:
+            logger.exception('Render failed')
+            self._send_json(500, {'error': str(error)})
+        else:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/pdf')
+            self.send_header('Content-Length', str(len(pdf_bytes)))
+            self.end_headers()
+            self.wfile.write(pdf_bytes)
+
+    def address_string(self):
+        # Unix socket clients have no address.
+        return self.client_address[0] if self.client_address else UNIX_PREFIX
+
+    def log_message(self, format, *args):
+        logger.debug('{client} {message}'.format(client=self.address_string(),
+                                                 message=format % args))
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def create_server(address, service):
+    # Addresses are either host:port, or unix:/path/to/socket.
+    if address.startswith(UNIX_PREFIX):
+        socket_path = address[len(UNIX_PREFIX):]
+        # A socket left behind by an earlier server is replaced, but any
+        # other file at the path is left alone.
+        if os.path.lexists(socket_path):
+            if not stat.S_ISSOCK(os.lstat(socket_path).st_mode):
+                raise ValueError('{path} exists and is not a socket'.format(path=socket_path))
+            os.remove(socket_path)
+        render_server = ThreadingUnixHTTPServer(socket_path, RenderRequestHandler)
+        render_server.socket_id = _file_id(socket_path)
+    else:
+        host, __, port = address.rpartition(':')
+        render_server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), RenderRequestHandler)
+    render_server.service = service
+    return render_server
+
+
+def _file_id(path):
+    path_stat = os.lstat(path)
+    return path_stat.st_dev, path_stat.st_ino
+
+
+def _remove_socket(render_server):
+    # Only the socket this server created, in case another has taken its place.
+    socket_path = render_server.server_address
+    try:
+        if _file_id(socket_path) == render_server.socket_id:
+            os.remove(socket_path)
+    except OSError:
+        pass
+
+
+def _terminate(signum, frame):
+    sys.exit(0)
+
+
+def serve(address, service):
+    render_server = create_server(address, service)
+    # Shut down cleanly when a process manager stops the server.
+    signal.signal(signal.SIGTERM, _terminate)
+    logger.info('Serving on {address}'.format(address=address))
+    try:
+        render_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        render_server.server_close()
+        if address.startswith(UNIX_PREFIX):
+            _remove_socket(render_server)
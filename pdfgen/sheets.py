@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+# Python Standard Library Imports
+import collections
+
+# Sheet layouts are worked out before anything is rendered, and the command
+# line tool reads them while parsing its arguments, so this module imports
+# neither reportlab nor PyPDF2. Points per centimetre, as in reportlab.
+CM = 72.0 / 2.54
+
+# Sheet sizes in centimetres, portrait.
+SHEET_SIZES = collections.OrderedDict([
+    ('A4', (21.0, 29.7)),
+    ('A3', (29.7, 42.0)),
+    ('SRA4', (22.5, 32.0)),
+    ('SRA3', (32.0, 45.0)),
+    ('letter', (21.59, 27.94)),
+    ('tabloid', (27.94, 43.18)),
+])
+
+Grid = collections.namedtuple('Grid', ['sheet_width', 'sheet_height', 'columns', 'rows',
+                                       'column_positions', 'row_positions',
+                                       'badge_width', 'badge_height'])
+
+
+def parse_sheet_size(value):
+    # A sheet is either named, such as A4 or SRA3, or given as WIDTHxHEIGHT
+    # in centimetres.
+    for name, size in SHEET_SIZES.items():
+        if value.lower() == name.lower():
+            return size
+    width, separator, height = value.lower().partition('x')
+    try:
+        size = (float(width), float(height))
+    except ValueError:
+        size = None
+    if not separator or size is None or min(size) <= 0.0:
+        raise ValueError('Sheet size should be one of {names} or WIDTHxHEIGHT in cm'.format(
+            names=', '.join(SHEET_SIZES)))
+    return size
+
+
+def parse_grid(value):
+    columns, separator, rows = value.lower().partition('x')
+    try:
+        grid = (int(columns), int(rows))
+    except ValueError:
+        grid = None
+    if not separator or grid is None or min(grid) < 1:
+        raise ValueError('Grid should be COLUMNSxROWS, such as 2x5')
+    return grid
+
+
+class SheetLayout(object):
+    # How badges are imposed on print sheets. Sizes are in centimetres, as
+    # in the layout file.
+    DEFAULT_SHEET = 'A4'
+    DEFAULT_MARGIN = 1.0
+    CROP_MARK_LENGTH = 0.5
+    CROP_MARK_OFFSET = 0.1
+    CROP_MARK_WIDTH = 0.25
+
+    def __init__(self, sheet_size=DEFAULT_SHEET, columns=None, rows=None,
+                 gutter=0.0, margin=DEFAULT_MARGIN, crop_marks=True, duplex=False):
+        if isinstance(sheet_size, str):
+            sheet_size = parse_sheet_size(sheet_size)
+        if gutter < 0.0 or margin < 0.0:
+            raise ValueError('Gutter and margin should not be negative')
+        self.sheet_size = tuple(sheet_size)
+        self.columns = columns
+        self.rows = rows
+        self.gutter = gutter
+        self.margin = margin
+        self.crop_marks = crop_marks
+        # Pages alternate between the front and back of each badge, and the
+        # backs go on their own sheet, mirrored to print on the reverse side.
+        self.duplex = duplex
+
+    def grid(self, badge_width, badge_height):
+        # Badge sizes are in points. Without a fixed number of columns and
+        # rows, as many badges as fit are placed, on whichever orientation of
+        # the sheet holds more.
+        sheet_width, sheet_height = (value * CM for value in self.sheet_size)
+        gutter = self.gutter * CM
+        margin = self.margin * CM
+
+        def fit(length, badge_length):
+            return max(int((length - 2.0 * margin + gutter) // (badge_length + gutter)), 0)
+
+        candidates = []
+        for width, height in ((sheet_width, sheet_height), (sheet_height, sheet_width)):
+            columns = self.columns or fit(width, badge_width)
+            rows = self.rows or fit(height, badge_height)
+            grid_width = columns * badge_width + (columns - 1) * gutter
+            grid_height = rows * badge_height + (rows - 1) * gutter
+            # Explicit grids have to keep clear of the margin too.
+            if columns and rows and grid_width <= width - 2.0 * margin \
+                    and grid_height <= height - 2.0 * margin:
+                candidates.append((columns * rows, width, height, columns, rows,
+                                   grid_width, grid_height))
+        if not candidates:
+            raise ValueError('Badges of {width:.1f} by {height:.1f} cm do not fit the sheet'.format(
+                width=badge_width / CM, height=badge_height / CM))
+        # The first orientation wins ties, so a sheet is only turned when
+        # that places more badges.
+        __, width, height, columns, rows, grid_width, grid_height = max(
+            candidates, key=lambda candidate: candidate[0])
+
+        # The grid is centred, so fronts and mirrored backs line up.
+        left = (width - grid_width) / 2.0
+        top = (height + grid_height) / 2.0
+        return Grid(sheet_width=width, sheet_height=height,
+                    columns=columns, rows=rows,
+                    column_positions=[left + column * (badge_width + gutter)
+                                      for column in range(columns)],
+                    row_positions=[top - badge_height - row * (badge_height + gutter)
+                                   for row in range(rows)],
+                    badge_width=badge_width, badge_height=badge_height)
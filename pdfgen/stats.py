@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+# Python Standard Library Imports
+import collections
+import threading
+import time
+
+STAGE_LAYOUT = 'layout'
+STAGE_FONTS = 'fonts'
+STAGE_TEMPLATE = 'template'
+STAGE_DRAW = 'draw'
+STAGE_MERGE = 'merge'
+STAGE_WRITE = 'write'
+
+
+def draw_stage(category):
+    return '{stage}.{category}'.format(stage=STAGE_DRAW, category=category)
+
+
+class RenderStats(object):
+    # A generator only records into its stats object when it has one, so
+    # leaving stats off costs one comparison per stage.
+    def __init__(self, hooks=None):
+        self.seconds = collections.OrderedDict()
+        self.calls = collections.OrderedDict()
+        self.counters = collections.OrderedDict()
+        # Each hook is called with the stage name and its duration in
+        # seconds, for forwarding to a metrics system.
+        self.hooks = list(hooks or [])
+        self._caches = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+        for hook in self.hooks:
+            hook(stage, seconds)
+
+    def count(self, counter, amount=1):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def timed(self, stage, function, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def watch(self, name, cache):
+        # Caches keep their own hit and miss counts, which are read when the
+        # stats are reported.
+        self._caches[name] = cache
+
+    def reset(self):
+        with self._lock:
+            self.seconds.clear()
+            self.calls.clear()
+            self.counters.clear()
+        for cache in self._caches.values():
+            cache.hits = 0
+            cache.misses = 0
+
+    def as_dict(self):
+        with self._lock:
+            stages = collections.OrderedDict(
+                (stage, {'seconds': seconds, 'calls': self.calls[stage]})
+                for stage, seconds in self.seconds.items()
+            )
+            counters = collections.OrderedDict(self.counters)
+        caches = collections.OrderedDict()
+        for name, cache in self._caches.items():
+            lookups = cache.hits + cache.misses
+            caches[name] = {
+                'hits': cache.hits,
+                'misses': cache.misses,
+                'hit_rate': cache.hits / float(lookups) if lookups else 0.0,
+            }
+        return collections.OrderedDict([
+            ('stages', stages),
+            ('counters', counters),
+            ('caches', caches),
+        ])
+
+    def summary(self):
+        report = self.as_dict()
+        lines = ['{:<16} {:>10} {:>8}'.format('stage', 'seconds', 'calls')]
+        for stage, timing in report['stages'].items():
+            lines.append('{:<16} {:>10.4f} {:>8}'.format(stage, timing['seconds'], timing['calls']))
+        for counter, value in report['counters'].items():
+            lines.append('{:<16} {:>10}'.format(counter, value))
+        for name, cache in report['caches'].items():
+            lines.append('{:<16} {:>9.1f}% {:>8}'.format(
+                name + ' cache', cache['hit_rate'] * 100.0, cache['hits'] + cache['misses']))
+        return '\n'.join(lines)
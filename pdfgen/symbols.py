@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+# Python Standard Library Imports
+import collections
+
+# Local Imports
+from pdfgen import lru
+
+# The reportlab barcode modules pull in its whole graphics stack, so each is
+# imported by the encoder that needs it, the first time a layout draws one.
+
+Symbol = collections.namedtuple('Symbol', ['rects', 'width', 'height', 'fill_color'])
+
+
+class _RectRecorder(object):
+    # Stands in for a canvas so a barcode reports its bars instead of
+    # drawing them.
+    def __init__(self):
+        self.rects = []
+
+    def rect(self, x, y, width, height, stroke=1, fill=0):
+        self.rects.append((x, y, width, height))
+
+
+def encode_qr(content, fill_color):
+    # The widget already merges each row's dark modules into runs; those
+    # runs, and the color reportlab would fill them with, are kept as is.
+    from reportlab.graphics.barcode import qr
+    qr_code = qr.QrCodeWidget(content, barFillColor=fill_color, barBorder=0)
+    group = qr_code.draw()
+    x1, y1, x2, y2 = group.getBounds()
+    modules = [shape for shape in group.contents if shape.fillColor is not None]
+    return Symbol(rects=tuple((shape.x, shape.y, shape.width, shape.height) for shape in modules),
+                  width=x2 - x1,
+                  height=y2 - y1,
+                  fill_color=modules[0].fillColor if modules else None)
+
+
+def encode_code39(content, bar_width, bar_height):
+    from reportlab.graphics.barcode import code39
+    barcode = code39.Standard39(content,
+                                barWidth=bar_width,
+                                barHeight=bar_height,
+                                checksum=False)
+    recorder = _RectRecorder()
+    barcode.canv = recorder
+    barcode.draw()
+    return Symbol(rects=tuple(recorder.rects),
+                  width=barcode.width,
+                  height=barcode.height,
+                  fill_color=None)
+
+
+def draw_symbol(draw_canvas, symbol):
+    # Each run is filled straight onto the canvas, without the graphics
+    # state renderPDF saves and restores around every shape. Runs are still
+    # filled one by one, so edges are anti-aliased exactly as before.
+    if symbol.fill_color is not None:
+        draw_canvas.setFillColor(symbol.fill_color)
+    for x, y, width, height in symbol.rects:
+        draw_canvas.rect(x, y, width, height, stroke=0, fill=1)
+
+
+class SymbolCache(lru.LruCache):
+    DEFAULT_SIZE = 1024
+
+    def qr(self, content, fill_color):
+        return self._get((encode_qr, content, fill_color), encode_qr, content, fill_color)
+
+    def code39(self, content, bar_width, bar_height):
+        return self._get((encode_code39, content, bar_width, bar_height),
+                         encode_code39, content, bar_width, bar_height)
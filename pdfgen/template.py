@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+# Python Standard Library Imports
+import io
+
+# Third Party Library Imports
+import PyPDF2
+
+# Local Imports
+from pdfgen import merge
+
+XOBJECT_NAME = '/PdfgenTemplate'
+
+
+class Template(object):
+    def __init__(self, template_path, compose=None):
+        self.template_path = template_path
+        # Called once per template page with the page as read, and returns
+        # the page every output page is built from.
+        self.compose = compose
+        with open(template_path, 'rb') as template_file:
+            self.reader = PyPDF2.PdfFileReader(io.BytesIO(template_file.read()))
+        self._pages = [None] * self.reader.getNumPages()
+        self._sizes = [None] * len(self._pages)
+
+    def page_index(self, index):
+        # Pages past the end of the template reuse the first page.
+        return index if index < len(self._pages) else 0
+
+    def page(self, index):
+        index = self.page_index(index)
+        page = self._pages[index]
+        if page is None:
+            page = self.reader.getPage(index)
+            if self.compose is not None:
+                page = self.compose(page)
+            self._pages[index] = page
+        return page
+
+    def page_size(self, index=0):
+        # Read from the page as is, since composing a page may need its size.
+        index = self.page_index(index)
+        size = self._sizes[index]
+        if size is None:
+            __, __, width, height = (float(value) for value in self.reader.getPage(index).mediaBox)
+            size = self._sizes[index] = (width, height)
+        return size
+
+    def fresh_page(self, index):
+        # A shallow copy shares the parsed content stream and resources with
+        # the template, but any merge into it leaves the template untouched.
+        page = PyPDF2.pdf.PageObject(self.reader)
+        page.update(self.page(index))
+        return page
+
+    def form_xobject(self, index):
+        # The template page's content stream is reused as is, still encoded,
+        # so turning a page into a Form XObject never decodes or parses it.
+        return merge.page_form(self.page(index))
+
+    def xobject_page(self, index, form_reference):
+        # A page that only draws the template's Form XObject, so documents
+        # with many records hold the template content once.
+        page = PyPDF2.pdf.PageObject(self.reader)
+        for key, value in self.page(index).items():
+            if key not in ('/Contents', '/Resources', '/Parent'):
+                page[key] = value
+
+        contents = PyPDF2.generic.DecodedStreamObject()
+        contents.setData('q {name} Do Q'.format(name=XOBJECT_NAME).encode('latin-1'))
+        page[PyPDF2.generic.NameObject('/Contents')] = contents
+        page[PyPDF2.generic.NameObject('/Resources')] = PyPDF2.generic.DictionaryObject({
+            PyPDF2.generic.NameObject('/XObject'): PyPDF2.generic.DictionaryObject({
+                PyPDF2.generic.NameObject(XOBJECT_NAME): form_reference,
+            }),
+        })
+        return page
@@ -1,48 +1,89 @@
 # -*- coding: utf-8 -*-
 
 
+def span_measure(words, calculate_length=len):
+    # Measures every word and the space once, so the length of any run of
+    # words joined by spaces is a subtraction of two prefix sums.
+    space_length = calculate_length(' ')
+    prefix_lengths = [0]
+    for word in words:
+        prefix_lengths.append(prefix_lengths[-1] + calculate_length(word))
+
+    def span_length(start, end):
+        return prefix_lengths[end] - prefix_lengths[start] + (end - start - 1) * space_length
+    return span_length
+
+
 def split_text(text, max_length, calculate_length=len, inverse=False):
     words = text.split()
     word_count = len(words)
-    if word_count > 1:
-        splitter_range = range(1, word_count)
-        if not inverse:
-            splitter_range = list(reversed(splitter_range))
-        candidate = (text, '')
-        for i in splitter_range:
-            left = ' '.join(words[:i])
-            right = ' '.join(words[i:])
-            long_side = right if inverse else left
-            short_side = left if inverse else right
-            long_side_length = calculate_length(long_side)
-            short_side_length = calculate_length(short_side)
-            if long_side_length < short_side_length:
-                return candidate
-            else:
-                candidate = (left, right)
-                if long_side_length < max_length:
-                    return candidate
-    else:
+    if word_count <= 1:
         return (text, '')
 
+    span_length = span_measure(words, calculate_length)
+    splitter_range = range(1, word_count)
+    if not inverse:
+        splitter_range = reversed(splitter_range)
+    candidate = None
+    for i in splitter_range:
+        left_length = span_length(0, i)
+        right_length = span_length(i, word_count)
+        long_side_length = right_length if inverse else left_length
+        short_side_length = left_length if inverse else right_length
+        if long_side_length < short_side_length:
+            break
+        candidate = i
+        if long_side_length < max_length:
+            break
+
+    if candidate is None:
+        return (text, '')
+    return (' '.join(words[:candidate]), ' '.join(words[candidate:]))
+
 
 def equal_split_text(text, calculate_length=len):
-    def generate_splitter(components):
-        def splitter(index):
-            left = ' '.join(components[:index])
-            right = ' '.join(components[index:])
-            left_length = calculate_length(left)
-            right_length = calculate_length(right)
-            length_diff = abs(left_length - right_length)
-            return (length_diff, left, right)
-        return splitter
+    words = text.split()
+    word_count = len(words)
+    if word_count <= 1:
+        return text, ''
+
+    span_length = span_measure(words, calculate_length)
+    differences = [abs(span_length(0, i) - span_length(i, word_count))
+                   for i in range(1, word_count)]
+    smallest_difference = min(differences)
+    # Ties go to the split whose halves sort first, as they always have.
+    return min((' '.join(words[:i]), ' '.join(words[i:]))
+               for i, difference in enumerate(differences, start=1)
+               if difference == smallest_difference)
+
 
+def wrap_text(text, max_length, max_lines, calculate_length=len, inverse=False):
+    # Fills lines greedily from the top, or from the bottom when inverse,
+    # and puts whatever is left on the last line.
     words = text.split()
-    word_splitter = generate_splitter(words)
     word_count = len(words)
-    if word_count > 1:
-        possible_splits = [word_splitter(i) for i in range(1, word_count)]
-        __, best_left, best_right = min(possible_splits)
-        return best_left, best_right
+    if word_count <= 1 or max_lines <= 1:
+        return [text]
+
+    span_length = span_measure(words, calculate_length)
+    if inverse:
+        def line_length(start, end):
+            return span_length(word_count - end, word_count - start)
     else:
-        return text, ''
+        line_length = span_length
+
+    spans = []
+    start = 0
+    while start < word_count and len(spans) < max_lines - 1:
+        end = start + 1
+        while end < word_count and line_length(start, end + 1) < max_length:
+            end += 1
+        spans.append((start, end))
+        start = end
+    if start < word_count:
+        spans.append((start, word_count))
+
+    if inverse:
+        return [' '.join(words[word_count - end:word_count - start])
+                for start, end in reversed(spans)]
+    return [' '.join(words[start:end]) for start, end in spans]
@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+
+# Python Standard Library Imports
+import collections
+import hashlib
+import io
+import zlib
+
+# Third Party Library Imports
+from PyPDF2 import generic
+
+# Local Imports
+from pdfgen import fonts
+
+PDF_HEADER = b'%PDF-1.3\n%\xe2\xe3\xcf\xd3\n'
+
+# Where a finished document ends and how to find its page tree, so that an
+# update can be appended to it later.
+Revision = collections.namedtuple('Revision', ['length', 'size', 'xref_position',
+                                               'pages_number', 'catalog_number'])
+
+
+class PdfStreamWriter(object):
+    def __init__(self, stream, compress=True, deduplicate_images=True,
+                 deduplicate_fonts=True, previous=None):
+        self._stream = stream
+        self._position = 0
+        self._first_number = 1
+        self._offsets = []
+        self._rewritten_offsets = collections.OrderedDict()
+        self._page_numbers = []
+        self._shared_sources = {}
+        self._unique_references = {}
+        self._paged_fonts = collections.OrderedDict()
+        self._font_depth = 0
+        self._closed = False
+
+        self.compress = compress
+        self.deduplicate_images = deduplicate_images
+        self.deduplicate_fonts = deduplicate_fonts
+        self.duplicate_images = 0
+        self.duplicate_fonts = 0
+        self.revision = None
+
+        # Given the Revision of a document this stream is positioned at the
+        # end of, pages are appended as an incremental update instead: the
+        # old objects stay where they are, new ones are numbered after them,
+        # and the page tree is rewritten under its old number, so pages kept
+        # from the old document still point at their parent.
+        self.previous = previous
+        if previous is None:
+            self._write(PDF_HEADER)
+            self._pages_reference = self._reserve()
+        else:
+            self._position = previous.length
+            self._first_number = previous.size
+            self._pages_reference = generic.IndirectObject(previous.pages_number, 0, self)
+
+    @property
+    def page_count(self):
+        return len(self._page_numbers)
+
+    @property
+    def bytes_written(self):
+        return self._position
+
+    def share(self, pdf):
+        # Objects read from a shared source, such as the template, are
+        # written once and referenced from every page. Objects from any other
+        # source are only deduplicated within the page that uses them, so
+        # per-page overlay readers can be released as soon as the page is out.
+        if id(pdf) not in self._shared_sources:
+            self._shared_sources[id(pdf)] = (pdf, {})
+
+    def add_object(self, obj):
+        if isinstance(obj, generic.StreamObject):
+            return self._write_object(self._copy_stream(obj, {}))
+        return self._write_object(self._copy(obj, {}))
+
+    def add_page(self, page):
+        local_references = {}
+        page_copy = generic.DictionaryObject()
+        for key, value in page.items():
+            if key != '/Parent':
+                page_copy[generic.NameObject(key)] = self._copy(value, local_references)
+        page_copy[generic.NameObject('/Type')] = generic.NameObject('/Page')
+        page_copy[generic.NameObject('/Parent')] = self._pages_reference
+        page_reference = self._write_object(page_copy)
+        self._page_numbers.append(page_reference.idnum)
+        if hasattr(self._stream, 'flush'):
+            self._stream.flush()
+        return page_reference
+
+    def keep_page(self, page_number):
+        # Places a page of the previous revision, by object number, next.
+        if self.previous is None:
+            raise ValueError('Only updates can keep pages of a previous revision')
+        self._page_numbers.append(page_number)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+
+        self._write_paged_fonts()
+        pages = generic.DictionaryObject({
+            generic.NameObject('/Type'): generic.NameObject('/Pages'),
+            generic.NameObject('/Kids'): generic.ArrayObject(
+                generic.IndirectObject(number, 0, self) for number in self._page_numbers
+            ),
+            generic.NameObject('/Count'): generic.NumberObject(len(self._page_numbers)),
+        })
+        self._write_object(pages, self._pages_reference)
+        if self.previous is None:
+            catalog_reference = self._write_object(generic.DictionaryObject({
+                generic.NameObject('/Type'): generic.NameObject('/Catalog'),
+                generic.NameObject('/Pages'): self._pages_reference,
+            }))
+        else:
+            catalog_reference = generic.IndirectObject(self.previous.catalog_number, 0, self)
+        size = self._first_number + len(self._offsets)
+
+        xref_position = self._position
+        xref = io.BytesIO()
+        xref.write(b'xref\n')
+        if self.previous is None:
+            xref.write('0 {count}\n'.format(count=size).encode('ascii'))
+            xref.write(b'0000000000 65535 f \n')
+        else:
+            # An update only lists the objects it wrote.
+            for number, offset in self._rewritten_offsets.items():
+                xref.write('{number} 1\n{offset:010d} 00000 n \n'.format(
+                    number=number, offset=offset).encode('ascii'))
+            if self._offsets:
+                xref.write('{first} {count}\n'.format(first=self._first_number,
+                                                       count=len(self._offsets)).encode('ascii'))
+        for offset in self._offsets:
+            if offset is None:
+                xref.write(b'0000000000 65535 f \n')
+            else:
+                xref.write('{offset:010d} 00000 n \n'.format(offset=offset).encode('ascii'))
+        xref.write(b'trailer\n')
+        trailer = generic.DictionaryObject({
+            generic.NameObject('/Size'): generic.NumberObject(size),
+            generic.NameObject('/Root'): catalog_reference,
+        })
+        if self.previous is not None:
+            trailer[generic.NameObject('/Prev')] = generic.NumberObject(self.previous.xref_position)
+        trailer.writeToStream(xref, None)
+        xref.write('\nstartxref\n{position}\n%%EOF\n'.format(position=xref_position).encode('ascii'))
+        self._write(xref.getvalue())
+        self.revision = Revision(length=self._position, size=size,
+                                 xref_position=xref_position,
+                                 pages_number=self._pages_reference.idnum,
+                                 catalog_number=catalog_reference.idnum)
+        if hasattr(self._stream, 'flush'):
+            self._stream.flush()
+
+    def _write(self, data):
+        self._stream.write(data)
+        self._position += len(data)
+
+    def _reserve(self):
+        self._offsets.append(None)
+        return generic.IndirectObject(self._first_number + len(self._offsets) - 1, 0, self)
+
+    def _write_object(self, obj, reference=None):
+        if reference is None:
+            reference = self._reserve()
+        buffer = io.BytesIO()
+        buffer.write('{number} 0 obj\n'.format(number=reference.idnum).encode('ascii'))
+        obj.writeToStream(buffer, None)
+        buffer.write(b'\nendobj\n')
+        if reference.idnum < self._first_number:
+            self._rewritten_offsets[reference.idnum] = self._position
+        else:
+            self._offsets[reference.idnum - self._first_number] = self._position
+        self._write(buffer.getvalue())
+        return reference
+
+    def _copy(self, value, local_references):
+        if isinstance(value, generic.IndirectObject):
+            if value.pdf is self:
+                return value
+            return self._copy_reference(value, local_references)
+        elif isinstance(value, generic.StreamObject):
+            # Streams can only be written as indirect objects.
+            return self._write_object(self._copy_stream(value, local_references))
+        elif isinstance(value, generic.DictionaryObject):
+            return self._copy_dictionary(value, local_references)
+        elif isinstance(value, generic.ArrayObject):
+            return generic.ArrayObject(self._copy(item, local_references) for item in value)
+        else:
+            return value
+
+    def _copy_reference(self, reference, local_references):
+        shared_source = self._shared_sources.get(id(reference.pdf))
+        if shared_source is None:
+            references = local_references
+            key = (id(reference.pdf), reference.idnum, reference.generation)
+        else:
+            references = shared_source[1]
+            key = (reference.idnum, reference.generation)
+
+        new_reference = references.get(key)
+        if new_reference is not None:
+            return new_reference
+
+        obj = reference.getObject()
+        if _is_paged_font(obj):
+            new_reference = self._paged_font(obj)
+            references[key] = new_reference
+            return new_reference
+
+        if self.deduplicate_images and _is_image(obj):
+            # Every overlay embeds its own copy of an image, so identical
+            # images are recognised by content and written only once.
+            new_reference, duplicate = self._write_unique(self._copy_stream(obj, local_references))
+            if duplicate:
+                self.duplicate_images += 1
+            references[key] = new_reference
+            return new_reference
+
+        if self.deduplicate_fonts and (self._font_depth or _is_font(obj)):
+            # Every overlay also embeds its own subset of each font it uses.
+            # Subsets holding the same glyphs are identical, so the font, its
+            # descriptor, font program and CMap are shared the same way.
+            self._font_depth += 1
+            try:
+                if isinstance(obj, generic.StreamObject):
+                    obj_copy = self._copy_stream(obj, local_references)
+                else:
+                    obj_copy = self._copy(obj, local_references)
+            finally:
+                self._font_depth -= 1
+            new_reference, duplicate = self._write_unique(obj_copy)
+            if duplicate and _is_font(obj):
+                self.duplicate_fonts += 1
+            references[key] = new_reference
+            return new_reference
+
+        # Register the reference before copying the object so that
+        # reference cycles resolve to the object being written.
+        new_reference = self._reserve()
+        references[key] = new_reference
+        if isinstance(obj, generic.StreamObject):
+            obj_copy = self._copy_stream(obj, local_references)
+        else:
+            obj_copy = self._copy(obj, local_references)
+        self._write_object(obj_copy, new_reference)
+        return new_reference
+
+    def _paged_font(self, obj):
+        # Overlays only say which codes of a font's code page they draw; the
+        # page's subset is written once, holding them all, when the document
+        # is closed, and every overlay refers to it in the meantime.
+        font_key = (bytes.fromhex(obj[fonts.PAGED_FONT_KEY]).decode('utf-8'),
+                    int(obj[fonts.PAGED_PAGE_KEY]))
+        paged_font = self._paged_fonts.get(font_key)
+        if paged_font is None:
+            paged_font = self._paged_fonts[font_key] = (self._reserve(), set())
+        else:
+            self.duplicate_fonts += 1
+        paged_font[1].update(bytes.fromhex(obj[fonts.PAGED_CODES_KEY]))
+        return paged_font[0]
+
+    def _write_paged_fonts(self):
+        for (font_name, page), (reference, codes) in self._paged_fonts.items():
+            subset = fonts.paged_subset(font_name, page, codes)
+            font_file = generic.DecodedStreamObject()
+            font_file.setData(subset.font_file)
+            font_file[generic.NameObject('/Length1')] = generic.NumberObject(len(subset.font_file))
+            to_unicode = generic.DecodedStreamObject()
+            to_unicode.setData(subset.to_unicode)
+            descriptor = generic.DictionaryObject({
+                generic.NameObject('/Type'): generic.NameObject('/FontDescriptor'),
+                generic.NameObject('/FontName'): generic.NameObject('/' + subset.base_font),
+                generic.NameObject('/Ascent'): _number(subset.ascent),
+                generic.NameObject('/CapHeight'): _number(subset.cap_height),
+                generic.NameObject('/Descent'): _number(subset.descent),
+                generic.NameObject('/Flags'): generic.NumberObject(subset.flags),
+                generic.NameObject('/FontBBox'): generic.ArrayObject(map(_number, subset.bbox)),
+                generic.NameObject('/ItalicAngle'): _number(subset.italic_angle),
+                generic.NameObject('/StemV'): _number(subset.stem_v),
+                generic.NameObject('/FontFile2'): self._write_object(self._copy_stream(font_file, {})),
+            })
+            self._write_object(generic.DictionaryObject({
+                generic.NameObject('/Type'): generic.NameObject('/Font'),
+                generic.NameObject('/Subtype'): generic.NameObject('/TrueType'),
+                generic.NameObject('/BaseFont'): generic.NameObject('/' + subset.base_font),
+                generic.NameObject('/FirstChar'): generic.NumberObject(0),
+                generic.NameObject('/LastChar'): generic.NumberObject(len(subset.widths) - 1),
+                generic.NameObject('/Widths'): generic.ArrayObject(map(_number, subset.widths)),
+                generic.NameObject('/ToUnicode'): self._write_object(self._copy_stream(to_unicode, {})),
+                generic.NameObject('/FontDescriptor'): self._write_object(descriptor),
+            }), reference)
+
+    def _write_unique(self, obj_copy):
+        digest = _object_digest(obj_copy)
+        reference = self._unique_references.get(digest)
+        if reference is not None:
+            return reference, True
+        reference = self._write_object(obj_copy)
+        self._unique_references[digest] = reference
+        return reference, False
+
+    def _copy_dictionary(self, dictionary, local_references, copy=None):
+        if copy is None:
+            copy = generic.DictionaryObject()
+        for key, value in dictionary.items():
+            # Back links would drag the source document's page tree along.
+            if key == '/Parent' and dictionary.get('/Type') == '/Page':
+                continue
+            if key == '/P' and dictionary.get('/Type') == '/Annot':
+                continue
+            copy[generic.NameObject(key)] = self._copy(value, local_references)
+        return copy
+
+    def _copy_stream(self, stream, local_references):
+        stream_copy = generic.EncodedStreamObject()
+        if isinstance(stream, generic.EncodedStreamObject):
+            stream_copy._data = stream._data
+        elif self.compress and '/Filter' not in stream:
+            stream_copy._data = zlib.compress(stream.getData())
+            stream_copy[generic.NameObject('/Filter')] = generic.NameObject('/FlateDecode')
+        else:
+            stream_copy._data = stream.getData()
+        self._copy_dictionary(stream, local_references, stream_copy)
+        return stream_copy
+
+
+def _is_image(obj):
+    return isinstance(obj, generic.StreamObject) and obj.get('/Subtype') == '/Image'
+
+
+def _is_font(obj):
+    return isinstance(obj, generic.DictionaryObject) and obj.get('/Type') == '/Font'
+
+
+def _is_paged_font(obj):
+    return isinstance(obj, generic.DictionaryObject) and fonts.PAGED_CODES_KEY in obj
+
+
+def _number(value):
+    # Integral values are written without a fraction, as reportlab does.
+    if float(value).is_integer():
+        return generic.NumberObject(int(value))
+    return generic.FloatObject('{value:.3f}'.format(value=value).rstrip('0'))
+
+
+def _object_digest(obj):
+    # Child objects were already copied, so equal objects reference equal
+    # objects and their dictionaries serialize identically.
+    digest = hashlib.sha256()
+    if not isinstance(obj, generic.DictionaryObject):
+        buffer = io.BytesIO()
+        obj.writeToStream(buffer, None)
+        digest.update(buffer.getvalue())
+        return digest.digest()
+    for key in sorted(obj.keys()):
+        if key != '/Length':
+            buffer = io.BytesIO()
+            generic.NameObject(key).writeToStream(buffer, None)
+            obj.raw_get(key).writeToStream(buffer, None)
+            digest.update(buffer.getvalue())
+    if isinstance(obj, generic.StreamObject):
+        digest.update(b'\nstream\n')
+        digest.update(obj._data)
+    return digest.digest()
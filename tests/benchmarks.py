@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import collections
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+import PyPDF2
+import reportlab
+
+from pdfgen import batch
+from pdfgen import engine
+from pdfgen import parallel
+from pdfgen import stats as render_stats
+
+TEMPLATE = 'tests/sample/template/guest.pdf'
+FONTS = 'tests/sample/font'
+IMAGES = 'tests/sample/image'
+RECORDS = 'tests/sample/records.csv'
+
+STAGES = [render_stats.STAGE_LAYOUT, render_stats.STAGE_FONTS, render_stats.STAGE_TEMPLATE,
+          render_stats.STAGE_DRAW, render_stats.STAGE_MERGE, render_stats.STAGE_WRITE]
+
+# Each scenario is a layout built on the sample template and fonts, plus the
+# per-record values of its fields. Values depend on the record index so that
+# caches only hit where real batches would hit them too.
+SCENARIOS = collections.OrderedDict([
+    ('text', {
+        'layout': {
+            'name': {'category': 'text', 'alignment': 'center', 'position': '2.8',
+                     'font': 'AkkLg_Pro_1', 'size': '14'},
+            'affiliation': {'category': 'text', 'alignment': 'left', 'position': '3.4',
+                            'font': 'AkkBd_Pro_1', 'size': '15', 'r_offset': '3.0'},
+            'table': {'category': 'text', 'alignment': 'right', 'position': '2.2',
+                      'font': 'AkkRg_Pro_1', 'size': '12'},
+        },
+        'values': lambda record, index: {
+            'name': '{name} {index}'.format(name=record['name'], index=index),
+            'affiliation': record['affiliation'],
+            'table': record['table'],
+        },
+    }),
+    ('qr', {
+        'layout': {
+            'name': {'category': 'text', 'position': '4.6', 'font': 'AkkLg_Pro_1', 'size': '10'},
+            'ticket': {'category': 'qr', 'size': '2', 'offset': '0.6', 'position': '1.0'},
+            'wifi': {'category': 'qr', 'size': '2', 'offset': '3.5', 'position': '1.0'},
+            'profile': {'category': 'qr', 'size': '2', 'offset': '6.4', 'position': '1.0'},
+        },
+        'values': lambda record, index: {
+            'name': record['name'],
+            'ticket': 'TICKET-{index:08d}'.format(index=index),
+            'wifi': 'WIFI:S:event;T:WPA;P:badge{index};;'.format(index=index % 16),
+            'profile': 'https://example.com/attendees/{index}'.format(index=index),
+        },
+    }),
+    ('barcode', {
+        'layout': {
+            'name': {'category': 'text', 'position': '4.5', 'font': 'AkkLg_Pro_1', 'size': '14'},
+            'code': {'category': 'bar', 'offset': '1.5', 'position': '2.0', 'font': 'Helvetica'},
+        },
+        'values': lambda record, index: {
+            'name': record['name'],
+            'code': 'A{index:07d}'.format(index=index),
+        },
+    }),
+    ('raster', {
+        'layout': {
+            'name': {'category': 'text', 'position': '2.8', 'font': 'AkkLg_Pro_1', 'size': '14'},
+            'image': {'category': 'image', 'size': '1', 'offset': '0.6', 'position': '0.6'},
+        },
+        'values': lambda record, index: {
+            'name': record['name'],
+            'image': 'a.png' if index % 2 else 'b.jpg',
+        },
+    }),
+    ('svg', {
+        'layout': {
+            'name': {'category': 'text', 'position': '2.8', 'font': 'AkkLg_Pro_1', 'size': '14'},
+            'image': {'category': 'image', 'size': '1', 'offset': '0.6', 'position': '0.6'},
+        },
+        'values': lambda record, index: {'name': record['name'], 'image': 'd.svg'},
+    }),
+    ('pdf', {
+        'layout': {
+            'name': {'category': 'text', 'position': '2.8', 'font': 'AkkLg_Pro_1', 'size': '14'},
+            'image': {'category': 'image', 'size': '1', 'offset': '0.6', 'position': '0.6'},
+        },
+        'values': lambda record, index: {'name': record['name'], 'image': 'c.pdf'},
+    }),
+])
+
+
+def parse_arguments(args=None):
+    argument_parser = argparse.ArgumentParser(description='Tinkertanker PDF Generator benchmarks')
+    argument_parser.add_argument('-s', '--scenarios', nargs='*', metavar='name',
+                                 choices=list(SCENARIOS),
+                                 help='scenarios to run: {names}; all by default'.format(
+                                     names=', '.join(SCENARIOS)))
+    argument_parser.add_argument('-n', '--records', nargs='*', metavar='count', type=int,
+                                 default=[1, 100, 1000],
+                                 help='record counts to render, from 1 up to 100000')
+    argument_parser.add_argument('-w', '--workers', nargs='*', metavar='count', type=int,
+                                 default=[1],
+                                 help='worker counts to compare, 0 for powers of two '
+                                      'up to the number of CPU cores')
+    argument_parser.add_argument('--shared-template', action='store_true',
+                                 help='render with the shared template mode')
+    argument_parser.add_argument('--json', metavar='file', type=str,
+                                 help='also write the results as JSON, or - for stdout only')
+    return argument_parser.parse_args(args)
+
+
+def default_worker_counts():
+    counts = [1]
+    while counts[-1] * 2 <= parallel.default_workers():
+        counts.append(counts[-1] * 2)
+    return counts
+
+
+class CountingSink(object):
+    # Stands in for the output file, so writing costs no disk I/O and the
+    # output can still be measured and compared.
+    def __init__(self):
+        self.bytes_written = 0
+        self.digest = hashlib.sha256()
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        self.digest.update(data)
+
+
+def stage_seconds(stats):
+    # Drawing is recorded per field category; the table sums them up.
+    stages = collections.OrderedDict((stage, 0.0) for stage in STAGES)
+    for stage, timing in stats.as_dict()['stages'].items():
+        stages[stage.split('.')[0]] += timing['seconds']
+    return stages
+
+
+def scenario_pages(scenario, count):
+    records = itertools.cycle(list(batch.read_records(RECORDS)))
+    for index, record in zip(range(count), records):
+        values = scenario['values'](record, index)
+        keys = sorted(values)
+        yield [values[key] for key in keys], keys
+
+
+def run_case(scenario_name, records, workers, shared_template, layout_path):
+    # Runs in a fresh process, so fonts load cold and peak RSS belongs to
+    # this case alone.
+    stats = render_stats.RenderStats()
+    scenario = SCENARIOS[scenario_name]
+    start = time.perf_counter()
+
+    generator = engine.PdfGenerator(TEMPLATE, layout_path, FONTS, IMAGES, stats=stats)
+
+    pages = scenario_pages(scenario, records)
+    entries_pages, order_pages = itertools.tee(pages)
+    sink = CountingSink()
+    generate_start = time.perf_counter()
+    generator.generate_to(sink,
+                          (entries for entries, __ in entries_pages),
+                          (order for __, order in order_pages),
+                          workers=workers, shared_template=shared_template)
+    generate_elapsed = time.perf_counter() - generate_start
+    elapsed = time.perf_counter() - start
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return collections.OrderedDict([
+        ('scenario', scenario_name),
+        ('records', records),
+        ('workers', workers),
+        ('shared_template', shared_template),
+        ('seconds', elapsed),
+        ('records_per_second', records / generate_elapsed),
+        # Linux reports kilobytes, macOS bytes.
+        ('peak_rss_bytes', max_rss if sys.platform == 'darwin' else max_rss * 1024),
+        ('output_bytes', sink.bytes_written),
+        ('bytes_per_page', sink.bytes_written / float(records)),
+        # With several workers, drawing happens in the worker processes and
+        # is left out of the stage times.
+        ('stage_seconds', stage_seconds(stats)),
+        ('stats', stats.as_dict()),
+        ('output_sha256', sink.digest.hexdigest()),
+    ])
+
+
+def _run_child(connection, function, args):
+    try:
+        connection.send((True, function(*args)))
+    except Exception as error:
+        connection.send((False, repr(error)))
+    finally:
+        connection.close()
+
+
+def run_isolated(function, *args):
+    # A plain process rather than a pool, since pool workers are daemons and
+    # could not start their own workers for the parallel cases.
+    context = multiprocessing.get_context('spawn')
+    parent_connection, child_connection = context.Pipe(duplex=False)
+    process = context.Process(target=_run_child, args=(child_connection, function, args))
+    process.start()
+    child_connection.close()
+    succeeded, result = parent_connection.recv()
+    process.join()
+    if not succeeded:
+        raise RuntimeError(result)
+    return result
+
+
+def environment():
+    return collections.OrderedDict([
+        ('python', platform.python_version()),
+        ('platform', platform.platform()),
+        ('cpu_count', parallel.default_workers()),
+        ('reportlab', reportlab.Version),
+        ('PyPDF2', PyPDF2.__version__),
+    ])
+
+
+def print_results(results):
+    header = '{:<8} {:>7} {:>3} {:>9} {:>10} {:>8} {:>9}  ' + '  '.join(['{:>8}'] * len(STAGES))
+    row = '{:<8} {:>7} {:>3} {:>9.3f} {:>10.1f} {:>8.1f} {:>9.0f}  ' + '  '.join(['{:>8.3f}'] * len(STAGES))
+    print(header.format('scenario', 'records', 'j', 'seconds', 'records/s', 'rss MB', 'bytes/pg',
+                        *STAGES))
+    for result in results:
+        print(row.format(result['scenario'], result['records'], result['workers'],
+                         result['seconds'], result['records_per_second'],
+                         result['peak_rss_bytes'] / 1048576.0, result['bytes_per_page'],
+                         *result['stage_seconds'].values()))
+
+
+def main():
+    args = parse_arguments()
+    scenario_names = args.scenarios or list(SCENARIOS)
+    worker_counts = sorted(set(itertools.chain.from_iterable(
+        default_worker_counts() if workers == 0 else [workers] for workers in args.workers
+    )))
+    for records in args.records:
+        if not 1 <= records <= 100000:
+            raise SystemExit('Record counts should be between 1 and 100000')
+
+    results = []
+    with tempfile.TemporaryDirectory() as layout_dir:
+        for scenario_name in scenario_names:
+            layout_path = os.path.join(layout_dir, '{name}.json'.format(name=scenario_name))
+            with open(layout_path, 'wt') as layout_file:
+                json.dump(SCENARIOS[scenario_name]['layout'], layout_file)
+            for records, workers in itertools.product(args.records, worker_counts):
+                results.append(run_isolated(run_case, scenario_name, records, workers,
+                                            args.shared_template, layout_path))
+
+    # Output is byte-for-byte the same for any number of workers.
+    identical = all(len({result['output_sha256'] for result in group}) == 1
+                    for __, group in itertools.groupby(results, key=lambda result: (
+                        result['scenario'], result['records'])))
+
+    report = collections.OrderedDict([
+        ('environment', environment()),
+        ('identical_across_workers', identical),
+        ('results', results),
+    ])
+    if args.json != '-':
+        print_results(results)
+        print('identical output across worker counts: {}'.format('yes' if identical else 'no'))
+    if args.json == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, 'wt') as json_file:
+            json.dump(report, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import collections
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+TEMPLATE = 'tests/sample/template/guest.pdf'
+FONTS = 'tests/sample/font'
+IMAGES = 'tests/sample/image'
+
+# Modules only some field categories need. A text-only job loading any of
+# them is a regression.
+HEAVY_MODULES = ['svglib', 'lxml', 'reportlab.graphics.barcode', 'reportlab.graphics.renderPDF',
+                 'multiprocessing', 'pdfgen.impose', 'pdfgen.parallel']
+
+# Parsing arguments renders nothing, so the command line tool should load
+# none of the rendering dependencies until it has.
+STARTUP_HEAVY_MODULES = HEAVY_MODULES + ['PyPDF2', 'reportlab']
+
+TEXT_LAYOUT = {
+    'name': {'category': 'text', 'alignment': 'center', 'position': '2.8',
+             'font': 'AkkLg_Pro_1', 'size': '14'},
+}
+
+# Each case runs in a fresh interpreter and reports the seconds it took after
+# startup, along with the heavy modules it ended up loading.
+CASE_CODE = '''
+import json, sys, time
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, sorted(name for name in {heavy!r} if name in sys.modules)]))
+'''
+
+# Each case is its code and the modules it should not load.
+CASES = collections.OrderedDict([
+    ('cli', ('import pdfgen.__main__', STARTUP_HEAVY_MODULES)),
+    ('help', ('import sys\nfrom pdfgen import __main__\nsys.argv = ["pdfgen", "--help"]\n'
+              'try:\n    __main__.parse_arguments()\nexcept SystemExit:\n    pass',
+              STARTUP_HEAVY_MODULES)),
+    ('engine', ('import pdfgen.engine', HEAVY_MODULES)),
+    ('text_job', ('import io\nfrom pdfgen import engine\n'
+                  'engine.PdfGenerator({template!r}, {layout!r}, {fonts!r}, {images!r})'
+                  '.generate_to(io.BytesIO(), [["Guest"]], [["name"]])', HEAVY_MODULES)),
+])
+
+
+def parse_arguments(args=None):
+    argument_parser = argparse.ArgumentParser(description='Tinkertanker PDF Generator import times')
+    argument_parser.add_argument('-r', '--repeat', metavar='count', type=int, default=5,
+                                 help='fresh interpreters to start per case')
+    argument_parser.add_argument('--json', metavar='file', type=str,
+                                 help='also write the results as JSON, or - for stdout only')
+    return argument_parser.parse_args(args)
+
+
+def run_case(code):
+    # The wall time includes interpreter startup; the case time does not.
+    wall_start = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', code], check=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout
+    wall_seconds = time.perf_counter() - wall_start
+    seconds, heavy_modules = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+    return seconds, wall_seconds, heavy_modules
+
+
+def main():
+    args = parse_arguments()
+    results = []
+    with tempfile.TemporaryDirectory() as layout_dir:
+        layout_path = os.path.join(layout_dir, 'text.json')
+        with open(layout_path, 'wt') as layout_file:
+            json.dump(TEXT_LAYOUT, layout_file)
+        for name, (case, heavy_modules) in CASES.items():
+            code = CASE_CODE.format(code=case.format(template=TEMPLATE, layout=layout_path,
+                                                     fonts=FONTS, images=IMAGES),
+                                    heavy=heavy_modules)
+            runs = [run_case(code) for __ in range(args.repeat)]
+            results.append(collections.OrderedDict([
+                ('case', name),
+                ('seconds', statistics.median(seconds for seconds, __, __ in runs)),
+                ('wall_seconds', statistics.median(wall for __, wall, __ in runs)),
+                ('heavy_modules', runs[-1][2]),
+            ]))
+
+    if args.json != '-':
+        print('{:<10} {:>10} {:>10}  {}'.format('case', 'ms', 'wall ms', 'heavy modules'))
+        for result in results:
+            print('{:<10} {:>10.1f} {:>10.1f}  {}'.format(
+                result['case'], result['seconds'] * 1000.0, result['wall_seconds'] * 1000.0,
+                ', '.join(result['heavy_modules']) or '-'))
+    if args.json == '-':
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, 'wt') as json_file:
+            json.dump(results, json_file, indent=2)
+
+    if any(result['heavy_modules'] for result in results):
+        raise SystemExit('Heavy modules were loaded without anything needing them')
+
+
+if __name__ == '__main__':
+    main()
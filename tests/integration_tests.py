@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import csv
+import http.client
+import json
 import subprocess
+import time
 
 TEST_CASES = [
     ('tests/expected/1.pdf', ['Guest', 'Company', 'Table 1', 'sample', 'a.png'], 'tests/tmp/1.pdf', 'tests/pdfdiff/1'),
@@ -10,11 +14,25 @@ TEST_CASES = [
     ('tests/expected/4.pdf', ['Student', 'School', '4A', 'class', 'd.svg'], 'tests/tmp/4.pdf', 'tests/pdfdiff/4')
 ]
 
+SHARED_TEMPLATE_TEST_CASES = [
+    ('tests/expected/1.pdf', ['Guest', 'Company', 'Table 1', 'sample', 'a.png'], 'tests/tmp/shared/1.pdf', 'tests/pdfdiff/shared/1'),
+    ('tests/expected/2.pdf', ['Person', 'Corporation', 'Table 2', 'example', 'b.jpg'], 'tests/tmp/shared/2.pdf', 'tests/pdfdiff/shared/2'),
+    ('tests/expected/3.pdf', ['Fan', 'Club', 'Row 3', 'group', 'c.pdf'], 'tests/tmp/shared/3.pdf', 'tests/pdfdiff/shared/3'),
+    ('tests/expected/4.pdf', ['Student', 'School', '4A', 'class', 'd.svg'], 'tests/tmp/shared/4.pdf', 'tests/pdfdiff/shared/4')
+]
+
+BATCH_TEST_CASES = [
+    ('tests/expected/1.pdf', 'tests/tmp/batch/1.pdf', 'tests/pdfdiff/batch/1'),
+    ('tests/expected/2.pdf', 'tests/tmp/batch/2.pdf', 'tests/pdfdiff/batch/2'),
+    ('tests/expected/3.pdf', 'tests/tmp/batch/3.pdf', 'tests/pdfdiff/batch/3'),
+    ('tests/expected/4.pdf', 'tests/tmp/batch/4.pdf', 'tests/pdfdiff/batch/4')
+]
+
 def run_command(c):
     p = subprocess.Popen(c)
     p.communicate()
 
-def run_pdfgen(strings, output):
+def run_pdfgen(strings, output, options=[]):
     run_command(['tinkertanker_pdfgen', '-t', 'tests/sample/template/guest.pdf',
                                         '-l', 'tests/sample/layout/guest.json',
                                         '-f', 'tests/sample/font',
@@ -22,8 +40,99 @@ def run_pdfgen(strings, output):
                                         '-e'] + strings +
                                        ['-k', 'name', 'affiliation', 'table', 'code', 'image',
                                         '-o', output,
+                                        '-v'] + options)
+
+def run_pdfgen_batch(records, output_template):
+    run_command(['tinkertanker_pdfgen', '-t', 'tests/sample/template/guest.pdf',
+                                        '-l', 'tests/sample/layout/guest.json',
+                                        '-f', 'tests/sample/font',
+                                        '-i', 'tests/sample/image',
+                                        '-b', records,
+                                        '-O', output_template,
                                         '-v'])
 
+def run_pdfgen_batch_file(records, output, options=[]):
+    run_command(['tinkertanker_pdfgen', '-t', 'tests/sample/template/guest.pdf',
+                                        '-l', 'tests/sample/layout/guest.json',
+                                        '-f', 'tests/sample/font',
+                                        '-i', 'tests/sample/image',
+                                        '-b', records,
+                                        '-o', output,
+                                        '-v'] + options)
+
+def write_records(rows, path):
+    with open(path, 'wt', newline='') as records_file:
+        records_writer = csv.writer(records_file)
+        records_writer.writerows(rows)
+
+def run_incremental_tests():
+    # Each step updates the same output with --incremental and compares it
+    # to the same records written from scratch.
+    run_command(['mkdir', '-p', 'tests/tmp/incremental'])
+    run_command(['rm', '-f', 'tests/tmp/incremental/output.pdf',
+                 'tests/tmp/incremental/output.pdf.manifest.json'])
+    with open('tests/sample/records.csv', 'rt', newline='') as records_file:
+        header, *rows = list(csv.reader(records_file))
+    steps = [
+        ('first', rows[1:]),
+        ('inserted', rows),
+        ('removed', rows[:2] + rows[3:]),
+    ]
+    for (name, step_rows) in steps:
+        records = 'tests/tmp/incremental/{name}.csv'.format(name=name)
+        write_records([header] + step_rows, records)
+        run_pdfgen_batch_file(records, 'tests/tmp/incremental/output.pdf',
+                              ['--incremental', '--record-key', 'name'])
+        expected = 'tests/tmp/incremental/{name}-full.pdf'.format(name=name)
+        run_pdfgen_batch_file(records, expected)
+        run_diff('tests/pdfdiff/incremental/{name}'.format(name=name),
+                 expected, 'tests/tmp/incremental/output.pdf')
+
+SERVER_PORT = 8765
+
+SERVER_TEST_CASES = [
+    ('image outside the image folder', 400,
+     {'records': [{'name': 'Guest', 'image': '../template/guest.pdf'}]}),
+    ('image at an absolute path', 400,
+     {'records': [{'name': 'Guest', 'image': '/etc/hostname'}]}),
+    ('entries that are not strings', 400,
+     {'entries': [1, 2], 'keys': ['name', 'table']}),
+    ('image inside the image folder', 200,
+     {'records': [{'name': 'Guest', 'image': 'a.png'}]}),
+]
+
+def request_server(method, path, body=None):
+    connection = http.client.HTTPConnection('127.0.0.1', SERVER_PORT, timeout=30)
+    try:
+        connection.request(method, path, body=None if body is None else json.dumps(body))
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+def run_server_tests():
+    server = subprocess.Popen(['tinkertanker_pdfgen', '-t', 'tests/sample/template/guest.pdf',
+                                                      '-l', 'tests/sample/layout/guest.json',
+                                                      '-f', 'tests/sample/font',
+                                                      '-i', 'tests/sample/image',
+                                                      '--serve', '127.0.0.1:{port}'.format(port=SERVER_PORT)])
+    try:
+        for __ in range(100):
+            try:
+                request_server('GET', '/health')
+                break
+            except OSError:
+                time.sleep(0.1)
+        for (name, expected_status, request) in SERVER_TEST_CASES:
+            status = request_server('POST', '/render', request)
+            print('server: {name}: {result}'.format(
+                name=name, result='OK' if status == expected_status else
+                'expected {expected}, got {status}'.format(expected=expected_status, status=status)))
+    finally:
+        server.terminate()
+        server.wait()
+
 
 def run_diff(temp, expected, actual):
     run_command(['tests/scripts/diffpdf.sh', temp, expected, actual])
@@ -33,6 +142,15 @@ def main():
     for (expected, strings, output, diffdir) in TEST_CASES:
         run_pdfgen(strings, output)
         run_diff(diffdir, expected, output)
+    run_command(['mkdir', '-p', 'tests/tmp/shared'])
+    for (expected, strings, output, diffdir) in SHARED_TEMPLATE_TEST_CASES:
+        run_pdfgen(strings, output, ['--shared-template'])
+        run_diff(diffdir, expected, output)
+    run_pdfgen_batch('tests/sample/records.csv', 'tests/tmp/batch/{index}.pdf')
+    for (expected, output, diffdir) in BATCH_TEST_CASES:
+        run_diff(diffdir, expected, output)
+    run_incremental_tests()
+    run_server_tests()
 
 if __name__ == '__main__':
     main()